@@ -0,0 +1,256 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+import shutil
+import sys
+import numpy as np
+from langchain_core.documents import Document
+
+# Allow running this file directly from RAG_Builder/ as well as importing it as a package module
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RAG_Builder.legal_tokenizer import TOKENIZER_NAME, tokenize
+
+# --- CONFIGURATION ---
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_ROOT = os.path.join(SOURCE_DIR, "bm25_index")
+
+# (file, Act label) - labels match the "source" metadata stored in legal_db
+SOURCE_FILES = [
+    ("ipc_data.json", "IPC"),
+    ("bns_data.json", "BNS"),
+    ("IT_Act.json", "IT Act, 2000"),
+]
+
+# Bump whenever the on-disk layout, tokenizer or scoring changes
+FORMAT_VERSION = 2
+
+# BM25Okapi parameters (same defaults as rank_bm25)
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+_ARRAYS = ["idf", "doc_len", "postings_indptr", "postings_docs", "postings_tf",
+           "postings_weight", "corpus_indptr", "corpus_tokens"]
+
+
+# --- 1. CORPUS ---
+def _source_paths(source_dir):
+    paths = []
+    for filename, law_name in SOURCE_FILES:
+        path = os.path.join(source_dir, filename)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"BM25 source file missing: {path}")
+        paths.append((path, law_name))
+    return paths
+
+def source_hash(source_dir=SOURCE_DIR):
+    """Version key for the artifact: format, tokenizer and the bytes of every source JSON."""
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}:{TOKENIZER_NAME}:{K1}:{B}".encode())
+    for path, law_name in _source_paths(source_dir):
+        digest.update(law_name.encode())
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def load_corpus(source_dir=SOURCE_DIR):
+    """Reads every Act into [{"page_content", "metadata"}] records."""
+    records = []
+    for path, law_name in _source_paths(source_dir):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        for entry in data:
+            content = (
+                f"Law: {law_name}\n"
+                f"Section: {entry.get('Section', '')}\n"
+                f"Title: {entry.get('section_title', '')}\n"
+                f"Definition: {entry.get('section_desc', '')}"
+            )
+            meta = {
+                "source": law_name,
+                "section_id": str(entry.get("Section", "")),
+                "title": str(entry.get("section_title", ""))
+            }
+            records.append({"page_content": content, "metadata": meta})
+    return records
+
+
+# --- 2. BUILD STEP ---
+def build_index(index_root=INDEX_ROOT, source_dir=SOURCE_DIR):
+    """
+    Tokenizes the corpus and writes vocab, IDF table, postings and the tokenized
+    corpus to index_root/<source hash>/. Returns the artifact directory.
+    """
+    key = source_hash(source_dir)
+    target = os.path.join(index_root, key[:16])
+    records = load_corpus(source_dir)
+
+    vocab = {}
+    corpus_tokens, corpus_indptr = [], [0]
+    for record in records:
+        for token in tokenize(record["page_content"]):
+            corpus_tokens.append(vocab.setdefault(token, len(vocab)))
+        corpus_indptr.append(len(corpus_tokens))
+
+    corpus_tokens = np.asarray(corpus_tokens, dtype=np.int32)
+    corpus_indptr = np.asarray(corpus_indptr, dtype=np.int64)
+    num_docs = len(records)
+    doc_len = np.diff(corpus_indptr).astype(np.float32)
+
+    # Postings: term-major (term, doc) -> tf, sorted by term then doc
+    doc_of_token = np.repeat(np.arange(num_docs, dtype=np.int64), np.diff(corpus_indptr))
+    pairs = corpus_tokens.astype(np.int64) * num_docs + doc_of_token
+    unique_pairs, tf = np.unique(pairs, return_counts=True)
+    postings_terms = unique_pairs // num_docs
+    postings_docs = (unique_pairs % num_docs).astype(np.int32)
+    postings_tf = tf.astype(np.float32)
+    doc_freq = np.bincount(postings_terms, minlength=len(vocab))
+    postings_indptr = np.concatenate([[0], np.cumsum(doc_freq)]).astype(np.int64)
+
+    # Okapi IDF; negative values are floored at EPSILON * mean IDF like rank_bm25
+    idf = np.log(num_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+    idf[idf < 0] = EPSILON * idf.mean()
+    idf = idf.astype(np.float32)
+
+    # Term-document matrix in CSR form (rows = terms). Each stored value is the
+    # full BM25 contribution of that term to that document, so a query is just a
+    # sum of rows.
+    avgdl = float(doc_len.mean()) if num_docs else 1.0
+    posting_len = doc_len[postings_docs]
+    postings_weight = (
+        np.repeat(idf, doc_freq) * postings_tf * (K1 + 1)
+        / (postings_tf + K1 * (1 - B + B * posting_len / avgdl))
+    ).astype(np.float32)
+
+    arrays = {
+        "idf": idf,
+        "doc_len": doc_len,
+        "postings_indptr": postings_indptr,
+        "postings_docs": postings_docs,
+        "postings_tf": postings_tf,
+        "postings_weight": postings_weight,
+        "corpus_indptr": corpus_indptr,
+        "corpus_tokens": corpus_tokens,
+    }
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "source_hash": key,
+        "tokenizer": TOKENIZER_NAME,
+        "k1": K1,
+        "b": B,
+        "num_docs": num_docs,
+        "avgdl": avgdl,
+    }
+
+    # Write into a private directory, then rename so readers never see a half-built index
+    os.makedirs(index_root, exist_ok=True)
+    tmp_dir = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "vocab.json"), 'w', encoding='utf-8') as f:
+        json.dump(sorted(vocab, key=vocab.get), f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "docs.json"), 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        # Another worker published the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _prune_stale(index_root, keep=os.path.basename(target))
+    return target
+
+def _prune_stale(index_root, keep):
+    for name in os.listdir(index_root):
+        if name != keep and ".tmp-" not in name:
+            shutil.rmtree(os.path.join(index_root, name), ignore_errors=True)
+
+
+# --- 3. MEMORY-MAPPED INDEX ---
+class BM25Index:
+    """
+    Read-only BM25 engine over a built artifact. The term-document CSR matrix is
+    memory-mapped, so startup cost is independent of corpus size, and a query
+    only touches the postings of its own terms. invoke() mirrors the LangChain
+    retriever interface used by perform_hybrid_search.
+    """
+
+    def __init__(self, path, k=4):
+        self.path = path
+        self.k = k
+        with open(os.path.join(path, "manifest.json"), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "vocab.json"), 'r', encoding='utf-8') as f:
+            self.vocab = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "docs.json"), 'r', encoding='utf-8') as f:
+            self.docs = json.load(f)
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r'))
+
+    @property
+    def version(self):
+        return self.manifest["source_hash"]
+
+    def get_scores(self, query):
+        """BM25 score of every document for the query (repeated terms count again)."""
+        term_counts = {}
+        for token in tokenize(query):
+            term_id = self.vocab.get(token)
+            if term_id is not None:
+                term_counts[term_id] = term_counts.get(term_id, 0) + 1
+
+        if not term_counts:
+            return np.zeros(len(self.docs), dtype=np.float32)
+
+        rows = [slice(self.postings_indptr[t], self.postings_indptr[t + 1]) for t in term_counts]
+        docs = np.concatenate([self.postings_docs[r] for r in rows])
+        weights = np.concatenate([self.postings_weight[r] * c for r, c in zip(rows, term_counts.values())])
+        return np.bincount(docs, weights=weights, minlength=len(self.docs)).astype(np.float32)
+
+    def top_k(self, query, k=None):
+        """[(doc index, score)] for the k best matching documents; ties go to the earlier document."""
+        scores = self.get_scores(query)
+        matched = np.flatnonzero(scores)
+        best = heapq.nlargest(k or self.k, matched, key=lambda i: (scores[i], -i))
+        return [(int(i), float(scores[i])) for i in best]
+
+    def invoke(self, query):
+        return [Document(**self.docs[i]) for i, _ in self.top_k(query)]
+
+
+def load_bm25_index(index_root=INDEX_ROOT, source_dir=SOURCE_DIR, k=4):
+    """
+    Opens the artifact matching the current source JSON, building it first if it
+    is missing or stale. Raises if a source file is missing.
+    """
+    key = source_hash(source_dir)
+    target = os.path.join(index_root, key[:16])
+    manifest_path = os.path.join(target, "manifest.json")
+    fresh = False
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            fresh = json.load(f).get("source_hash") == key
+    if not fresh:
+        logging.info(f"BM25 artifact missing or stale, building {target}")
+        shutil.rmtree(target, ignore_errors=True)
+        target = build_index(index_root, source_dir)
+    return BM25Index(target, k=k)
+
+
+if __name__ == "__main__":
+    print("🔨 Building BM25 index...")
+    path = build_index()
+    index = BM25Index(path)
+    print(f"✅ Indexed {index.manifest['num_docs']} sections, "
+          f"{len(index.vocab)} terms -> {path}")
+    if len(sys.argv) > 1:
+        for doc in index.invoke(" ".join(sys.argv[1:])):
+            print(f"   {doc.metadata['source']} {doc.metadata['section_id']} - {doc.metadata['title']}")
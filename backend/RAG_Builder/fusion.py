@@ -0,0 +1,96 @@
+import numpy as np
+
+# --- CONFIGURATION ---
+RRF_K = 60          # Standard RRF damping constant
+LAMBDA_MULT = 0.5   # MMR balance between relevance (1.0) and diversity (0.0)
+
+
+# --- 1. RANK FUSION (RRF over any number of retrievers) ---
+def reciprocal_rank_fusion(ranked_lists, weights=None, key=None, k=RRF_K):
+    """
+    Fuses N ranked lists with weighted Reciprocal Rank Fusion.
+
+    Args:
+        ranked_lists: list of result lists, each ordered best-first.
+        weights: one weight per list (defaults to 1.0 each).
+        key: function mapping an item to its identity; items that map to None
+             are skipped. Defaults to the item itself.
+        k: RRF damping constant.
+
+    Returns:
+        [(item, score)] sorted by fused score, highest first. The item kept for
+        each key is the first one seen; ties keep first-seen order.
+    """
+    if weights is None:
+        weights = [1.0] * len(ranked_lists)
+    if len(weights) != len(ranked_lists):
+        raise ValueError("weights must have one entry per ranked list")
+    if key is None:
+        key = lambda item: item
+
+    slots = {}          # key -> position in `items`
+    items = []
+    positions, contributions = [], []
+    for results, weight in zip(ranked_lists, weights):
+        for rank, item in enumerate(results):
+            item_key = key(item)
+            if item_key is None:
+                continue
+            if item_key not in slots:
+                slots[item_key] = len(items)
+                items.append(item)
+            positions.append(slots[item_key])
+            contributions.append(weight / (rank + k))
+
+    if not items:
+        return []
+
+    scores = np.bincount(positions, weights=contributions, minlength=len(items))
+    order = np.argsort(-scores, kind="stable")
+    return [(items[i], float(scores[i])) for i in order]
+
+
+# --- 2. DIVERSITY (Maximal Marginal Relevance) ---
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-8)
+
+def mmr_select(query_vec, doc_vecs, k, lambda_mult=LAMBDA_MULT):
+    """
+    Picks up to k candidates by Maximal Marginal Relevance using cosine similarity.
+
+    Computes one query-candidate similarity vector and one candidate Gram
+    matrix up front, then keeps a running "max similarity to anything selected"
+    per candidate, so each pick is a single vector update instead of a rescan
+    of the selected set.
+
+    Returns:
+        Indices into doc_vecs, in selection order.
+    """
+    doc_matrix = np.asarray(doc_vecs, dtype=np.float32)
+    if doc_matrix.ndim != 2 or len(doc_matrix) == 0 or k <= 0:
+        return []
+
+    docs = _normalize_rows(doc_matrix)
+    query = _normalize_rows(np.asarray(query_vec, dtype=np.float32))
+
+    relevance = docs @ query        # (n,)
+    gram = docs @ docs.T            # (n, n)
+
+    # lambda * rel + (1 - lambda) * (1 - max_sim) ranks the same as the form below
+    max_sim = np.full(len(docs), -np.inf, dtype=np.float32)
+    available = np.ones(len(docs), dtype=bool)
+    selected = []
+
+    for _ in range(min(k, len(docs))):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        idx = int(np.argmax(scores))
+        selected.append(idx)
+        available[idx] = False
+        np.maximum(max_sim, gram[idx], out=max_sim)
+
+    return selected
@@ -1,142 +1,119 @@
-import json
 import os
+import sys
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.retrievers import BM25Retriever
-from langchain_core.documents import Document
-from deep_translator import GoogleTranslator
 import numpy as np
 
+# Allow running this file directly from RAG_Builder/ as well as importing it as a package module
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RAG_Builder.bm25_index import load_bm25_index
+from RAG_Builder.fusion import reciprocal_rank_fusion, mmr_select
+from RAG_Builder.translation import translate_query
+
 # --- CONFIGURATION ---
 DB_DIRECTORY = "./legal_db"
-JSON_FILE = "ipc_data.json"
 MODEL_NAME = "BAAI/bge-small-en-v1.5"
 
 # --- 1. SETUP: LOAD DATA FOR KEYWORD SEARCH (BM25) ---
 def load_bm25_retriever():
-    docs = []
-    
-    # List of all your data files
-    files = ["ipc_data.json", "bns_data.json"]
-    
-    for filename in files:
-        if not os.path.exists(filename):
+    """
+    Opens the persisted BM25 artifact for IPC, BNS and the IT Act (memory-mapped).
+    The artifact is rebuilt automatically when any source JSON changes; build it
+    ahead of time with `python -m RAG_Builder.bm25_index`.
+    """
+    return load_bm25_index(k=4)
+
+# --- 2. SECTION VECTOR TABLE (reused by MMR) ---
+def _section_key(meta):
+    # Section numbers repeat across Acts (IPC 302 vs BNS 302), so key on both
+    return (str(meta.get('source', '')), str(meta.get('section_id', '')))
+
+def _stored_rows(data):
+    # Chroma may hand embeddings back as a numpy array, so no truthiness tests here
+    metadatas = data.get("metadatas")
+    embeddings = data.get("embeddings")
+    if metadatas is None or embeddings is None:
+        return []
+    return zip(metadatas, embeddings)
+
+def load_section_vectors(vector_db):
+    """
+    Reads every stored embedding out of the Chroma collection once and returns
+    a {(source, section_id): vector} table. MMR looks candidates up here instead
+    of re-embedding their text on every query.
+    """
+    data = vector_db.get(include=["embeddings", "metadatas"])
+    table = {}
+    for meta, emb in _stored_rows(data):
+        if not meta:
             continue
-            
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        for entry in data:
-            # Handle both IPC and BNS formats
-            law_name = "BNS" if "BNS" in entry.get('source', '') else "IPC"
-            
-            content = (
-                f"Law: {law_name}\n"
-                f"Section: {entry.get('Section', '')}\n"
-                f"Title: {entry.get('section_title', '')}\n"
-                f"Definition: {entry.get('section_desc', '')}"
-            )
-            meta = {
-                "section_id": str(entry.get("Section", "")),
-                "title": str(entry.get("section_title", ""))
-            }
-            docs.append(Document(page_content=content, metadata=meta))
-    
-    if not docs:
-        return None
-        
-    retriever = BM25Retriever.from_documents(docs)
-    retriever.k = 4
-    return retriever
-
-# --- 2. HELPER: TRANSLATION ---
-def translate_query(text):
-    try:
-        if not text.isascii():
-            return GoogleTranslator(source='auto', target='en').translate(text)
-        return text
-    except:
-        return text
+        table.setdefault(_section_key(meta), np.asarray(emb, dtype=np.float32))
+    return table
+
+def _candidate_vectors(candidate_docs, vector_db, section_vectors):
+    """
+    Resolves a vector for every candidate: first from the precomputed table,
+    then from the index by metadata, and only as a last resort by embedding
+    the text (all misses in one batch). Resolved vectors are added to the table.
+    """
+    keys = [_section_key(doc.metadata) for doc in candidate_docs]
+    missing = [key for key in dict.fromkeys(keys) if key not in section_vectors]
+
+    if missing:
+        data = vector_db.get(
+            where={"section_id": {"$in": [sec_id for _, sec_id in missing]}},
+            include=["embeddings", "metadatas"]
+        )
+        for meta, emb in _stored_rows(data):
+            key = _section_key(meta or {})
+            if key in missing and key not in section_vectors:
+                section_vectors[key] = np.asarray(emb, dtype=np.float32)
+
+    unresolved = [i for i, key in enumerate(keys) if key not in section_vectors]
+    if unresolved:
+        texts = [candidate_docs[i].page_content for i in unresolved]
+        for i, emb in zip(unresolved, vector_db._embedding_function.embed_documents(texts)):
+            section_vectors[keys[i]] = np.asarray(emb, dtype=np.float32)
+
+    return [section_vectors[key] for key in keys]
 
 # --- 3. THE CUSTOM HYBRID LOGIC (RRF Algorithm) ---
-def perform_hybrid_search(query, vector_db, bm25_retriever):
+def perform_hybrid_search(query, vector_db, bm25_retriever, section_vectors=None,
+                          vector_k=15, keyword_k=15, mmr_k=6, lambda_mult=0.5):
     """
     Manually combines Vector Search and Keyword Search (hybrid), then applies MMR for diversity.
+    Pass the table from load_section_vectors() so the query embedding is the only model call.
+    vector_k/keyword_k are the candidate pool sizes, mmr_k the number of results returned.
     """
+    if section_vectors is None:
+        section_vectors = {}
+
     # --- A. Get Results from both "Brains" (increase k for more candidates) ---
-    vector_k = 15
-    keyword_k = 15
-    mmr_k = 6  # Final number of results to return
+    # Embed the query once; it drives both the vector search and MMR
+    query_emb = vector_db._embedding_function.embed_query(query)
 
     # 1. Vector Search (Semantic)
-    vector_results = vector_db.similarity_search(query, k=vector_k)
+    vector_results = vector_db.similarity_search_by_vector(query_emb, k=vector_k)
 
     # 2. Keyword Search (Exact Match)
     keyword_results = bm25_retriever.invoke(query)[:keyword_k]
 
     # --- B. Combine Results using RRF (Reciprocal Rank Fusion) ---
-    combined_scores = {}
-    def add_to_scores(results, weight=1.0):
-        for rank, doc in enumerate(results):
-            doc_id = doc.metadata.get('section_id')
-            if not doc_id:
-                continue
-            score = 1 / (rank + 60)
-            if doc_id in combined_scores:
-                combined_scores[doc_id]['score'] += score * weight
-            else:
-                combined_scores[doc_id] = {'doc': doc, 'score': score * weight}
-    add_to_scores(vector_results, weight=1.0)
-    add_to_scores(keyword_results, weight=1.0)
-
-    # --- C. Sort by Final Score (Highest first) ---
-    sorted_results = sorted(combined_scores.values(), key=lambda x: x['score'], reverse=True)
-    candidate_docs = [item['doc'] for item in sorted_results]
-
-    # --- D. Apply MMR (Maximal Marginal Relevance) to candidates ---
-    def cosine_similarity(a, b):
-        # Simple cosine similarity for text embeddings
-        import numpy as np
-        a = np.array(a)
-        b = np.array(b)
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-8)
-
-    def get_embedding(text):
-        # Use the same embedding function as vector_db
-        return vector_db._embedding_function.embed_query(text)
-
-    # Get embeddings for query and all candidate docs
-    query_emb = get_embedding(query)
-    doc_embs = [get_embedding(doc.page_content) for doc in candidate_docs]
-
-    # MMR selection
-    selected = []
-    selected_indices = []
-    lambda_mult = 0.5  # Balance between relevance and diversity
-    for _ in range(min(mmr_k, len(candidate_docs))):
-        if not selected:
-            # First: pick the most relevant (highest similarity to query)
-            sims = [cosine_similarity(query_emb, emb) for emb in doc_embs]
-            idx = int(np.argmax(sims))
-            selected.append(candidate_docs[idx])
-            selected_indices.append(idx)
-        else:
-            max_score = -float('inf')
-            max_idx = -1
-            for i, emb in enumerate(doc_embs):
-                if i in selected_indices:
-                    continue
-                relevance = cosine_similarity(query_emb, emb)
-                diversity = min([1 - cosine_similarity(emb, doc_embs[j]) for j in selected_indices])
-                mmr_score = lambda_mult * relevance + (1 - lambda_mult) * diversity
-                if mmr_score > max_score:
-                    max_score = mmr_score
-                    max_idx = i
-            if max_idx == -1:
-                break
-            selected.append(candidate_docs[max_idx])
-            selected_indices.append(max_idx)
-    return selected
+    fused = reciprocal_rank_fusion(
+        [vector_results, keyword_results],
+        weights=[1.0, 1.0],
+        key=lambda doc: _section_key(doc.metadata) if doc.metadata.get('section_id') else None
+    )
+    candidate_docs = [doc for doc, _ in fused]
+    if not candidate_docs:
+        return []
+
+    # --- C. Apply MMR (Maximal Marginal Relevance) to candidates ---
+    # Candidate vectors come from the index, not from the model
+    doc_embs = _candidate_vectors(candidate_docs, vector_db, section_vectors)
+    selected = mmr_select(query_emb, doc_embs, k=mmr_k, lambda_mult=lambda_mult)
+    return [candidate_docs[i] for i in selected]
 
 # --- MAIN EXECUTION ---
 def main():
@@ -149,6 +126,7 @@ def main():
         encode_kwargs={'normalize_embeddings': True}
     )
     vector_db = Chroma(persist_directory=DB_DIRECTORY, embedding_function=embedding_function)
+    section_vectors = load_section_vectors(vector_db)
     
     # Setup Keyword DB
     bm25 = load_bm25_retriever()
@@ -168,7 +146,7 @@ def main():
             print(f"   (Translated: {processed_query})")
 
         # --- RUN HYBRID SEARCH ---
-        results = perform_hybrid_search(processed_query, vector_db, bm25)
+        results = perform_hybrid_search(processed_query, vector_db, bm25, section_vectors)
         
         print(f"\n--- Top Hybrid Matches ---")
         for i, doc in enumerate(results):
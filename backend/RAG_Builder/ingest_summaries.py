@@ -0,0 +1,102 @@
+import argparse
+import csv
+import json
+import os
+import re
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(BASE_DIR, "mappings.csv")   # official BNS<->IPC correspondence table
+JSON_OUTPUT_FILE = os.path.join(os.path.dirname(BASE_DIR), "ipc_bns_summaries.json")  # read by mapper.py
+
+_SPACE_RE = re.compile(r"\s+")
+# Separators in cells that name several sections: "54 & 55", "68, 69", "376(1)/376(2)", "29 and 29A"
+_SPLIT_RE = re.compile(r"\s*(?:&|,|/|\band\b)\s*")
+_PARENT_RE = re.compile(r"\(")
+_DITTO_RE = re.compile(r"^ditto\.?$", re.IGNORECASE)
+
+
+def section_key(raw: str) -> str:
+    """
+    Join key for a section cell: PDF line breaks and stray spaces removed,
+    so "137 (1)\\n(b)" and "137(1)(b)" match. Non-numeric cells such as
+    "Explanation to section 5" only have their whitespace normalised.
+    """
+    raw = _clean(raw)
+    return _SPACE_RE.sub("", raw) if raw[:1].isdigit() else raw
+
+
+def split_sections(raw: str) -> list:
+    """
+    One join key per section named in a cell: "54 & 55" -> ["54", "55"],
+    "228A(1)/(2)" -> ["228A(1)", "228A(2)"], "363A," -> ["363A"]. Cells that
+    name a single section (or no section) give a one-element list.
+    """
+    raw = _clean(raw)
+    if not raw[:1].isdigit():
+        return [raw]
+    keys = []
+    for part in _SPLIT_RE.split(raw):
+        part = _SPACE_RE.sub("", part)
+        if not part:
+            continue
+        if part.startswith("(") and keys:
+            # "(2)" after "228A(1)" is another sub-section of the same section
+            part = _PARENT_RE.split(keys[-1], 1)[0] + part
+        keys.append(part)
+    return keys or [section_key(raw)]
+
+
+def _clean(cell: str) -> str:
+    # Cells carry the PDF's line wraps and non-breaking spaces
+    return _SPACE_RE.sub(" ", (cell or "").replace("\xa0", " ")).strip()
+
+
+def parse_mappings_csv(path: str = CSV_FILE):
+    """
+    Rows of the official table as {"BNS_Section", "IPC_Section", "Subject",
+    "Summary"}. Skips the title and column-header rows and the blank spacer
+    rows, and resolves "Ditto." to the summary of the row above. A row whose
+    IPC cell names several sections ("54 & 55") becomes one row per section.
+    """
+    rows = []
+    previous_summary = ""
+    with open(path, newline="", encoding="utf-8") as f:
+        for cells in csv.reader(f):
+            cells = (cells + ["", "", "", ""])[:4]
+            bns, subject, ipc, summary = (_clean(c) for c in cells)
+            # Header noise: the table title spans one cell, the column header names the columns
+            if not bns or bns.upper().startswith(("CORRESPONDENCE", "BNS ")):
+                continue
+            if _DITTO_RE.match(summary):
+                summary = previous_summary
+            previous_summary = summary
+            for ipc_key in split_sections(ipc):
+                rows.append({
+                    "BNS_Section": section_key(bns),
+                    "IPC_Section": ipc_key,
+                    "Subject": subject,
+                    "Summary": summary,
+                })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the official BNS<->IPC correspondence table to JSON.")
+    parser.add_argument("--csv", default=CSV_FILE, help=f"table exported from the PDF (default: {CSV_FILE})")
+    parser.add_argument("--output", required=True,
+                        help=f"JSON file to write; mapper.py reads {JSON_OUTPUT_FILE}")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.csv):
+        print(f"❌ Error: {args.csv} not found.")
+        return 1
+    summaries = parse_mappings_csv(args.csv)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, indent=4, ensure_ascii=False)
+    print(f"✅ Wrote {len(summaries)} official comparison summaries to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,35 @@
+import re
+
+# --- CONFIGURATION ---
+TOKENIZER_NAME = "legal-v1"
+
+# A section reference is a number with an optional letter suffix (66A, 124A) followed by
+# any chain of bracketed sub-clauses: 302, 2(1), 2(1)(a), 3(5)(ii). Everything else is
+# plain words; hyphenated words are joined so "sub-section" matches "subsection".
+_TOKEN_RE = re.compile(r"\d+[a-z]*(?:\([a-z0-9]{1,4}\))*|[^\W\d_]+(?:-[^\W\d_]+)*")
+_CLAUSE_RE = re.compile(r"\([a-z0-9]{1,4}\)")
+
+
+def tokenize(text):
+    """
+    Lowercases, drops punctuation and keeps section identifiers intact, so
+    "302", "302." and "Section 302," all become "302".
+
+    A sub-clause reference also emits every parent level: "2(1)(a)" yields
+    "2", "2(1)" and "2(1)(a)", so a query for "section 2" still matches text
+    that only cites "2(1)(a)" while "2(1)" ranks the exact clause higher.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group(0)
+        paren = token.find("(")
+        if paren == -1:
+            tokens.append(token.replace("-", ""))
+            continue
+
+        prefix = token[:paren]
+        tokens.append(prefix)
+        for clause in _CLAUSE_RE.findall(token, paren):
+            prefix += clause
+            tokens.append(prefix)
+    return tokens
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- CONFIGURATION ---
+DEFAULT_MAXSIZE = 512
+DEFAULT_TTL = 6 * 60 * 60     # seconds an entry stays valid
+VERSION_CHECK_INTERVAL = 5    # seconds between index fingerprint checks
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query."""
+    return " ".join(str(query).lower().split())
+
+def index_fingerprint(*paths):
+    """
+    Cheap change detector for on-disk indexes: (path, mtime, size) of every file
+    under the given files/directories. Missing paths are recorded as such.
+    """
+    entries = []
+    for root in paths:
+        if not root:
+            continue
+        if os.path.isfile(root):
+            stat = os.stat(root)
+            entries.append((root, stat.st_mtime_ns, stat.st_size))
+            continue
+        if not os.path.isdir(root):
+            entries.append((root, None, None))
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries, key=lambda e: e[0]))
+
+
+class SearchCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL for retrieval results.
+
+    If version_fn is given, its return value is compared (at most every
+    VERSION_CHECK_INTERVAL seconds) with the one seen when entries were
+    stored; any change clears the cache, so a rebuilt legal_db or BM25
+    artifact never serves old results.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, version_fn=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._version = version_fn() if version_fn else None
+        self._version_checked = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, **params):
+        return (normalize_query(query),) + tuple(sorted(params.items()))
+
+    def _check_version(self, now):
+        if self.version_fn is None:
+            return
+        with self._lock:
+            if now - self._version_checked < VERSION_CHECK_INTERVAL:
+                return
+            # Claimed under the lock, so one thread walks the index while the rest carry on
+            self._version_checked = now
+        version = self.version_fn()
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries.clear()
+                self.invalidations += 1
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        now = time.monotonic()
+        self._check_version(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        now = time.monotonic()
+        self._check_version(now)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
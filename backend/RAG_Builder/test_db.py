@@ -1,24 +1,18 @@
+import os
 import sys
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from deep_translator import GoogleTranslator
 import json
+
+# Share the cached, glossary-backed translator used by the hybrid retriever
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RAG_Builder.translation import translate_query
+
 # --- CONFIGURATION ---
 DB_DIRECTORY = "./legal_db"
 MODEL_NAME = "BAAI/bge-small-en-v1.5"
 CONFIDENCE_THRESHOLD = 0.35  # Tune this (0.0 to 1.0). 
 
-def translate_query(text):
-    try:
-        # Only translate if characters are non-ASCII (likely Hindi/Indic)
-        if not text.isascii():
-            translated = GoogleTranslator(source='auto', target='en').translate(text)
-            return translated
-        return text
-    except Exception as e:
-        print(f"⚠️ Translation Error: {e}")
-        return text
-
 def main():
     print("⏳ Loading Legal Brain...")
     embedding_function = HuggingFaceEmbeddings(
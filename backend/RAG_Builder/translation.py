@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from deep_translator import GoogleTranslator
+
+# --- CONFIGURATION ---
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", os.path.join(SOURCE_DIR, "translation_cache.json"))
+TIMEOUT = float(os.getenv("TRANSLATION_TIMEOUT", "2.0"))   # seconds to wait for Google
+MAX_CACHE_ENTRIES = 10000
+
+# Common Hindi legal vocabulary. Multi-word phrases are matched before single words.
+GLOSSARY = {
+    "भारतीय दंड संहिता": "Indian Penal Code",
+    "भारतीय न्याय संहिता": "Bharatiya Nyaya Sanhita",
+    "सूचना प्रौद्योगिकी अधिनियम": "Information Technology Act",
+    "आईपीसी": "IPC",
+    "बीएनएस": "BNS",
+    "धारा": "section",
+    "उपधारा": "subsection",
+    "अधिनियम": "act",
+    "संहिता": "code",
+    "कानून": "law",
+    "चोरी": "theft",
+    "हत्या": "murder",
+    "प्रयास": "attempt",
+    "सजा": "punishment",
+    "सज़ा": "punishment",
+    "दंड": "punishment",
+    "कारावास": "imprisonment",
+    "कैद": "imprisonment",
+    "आजीवन": "life",
+    "मृत्युदंड": "death penalty",
+    "मृत्यु": "death",
+    "जुर्माना": "fine",
+    "बलात्कार": "rape",
+    "अपहरण": "kidnapping",
+    "धोखाधड़ी": "cheating",
+    "धोखा": "cheating",
+    "ठगी": "cheating",
+    "लूट": "robbery",
+    "डकैती": "dacoity",
+    "सेंधमारी": "house breaking",
+    "अतिचार": "trespass",
+    "मारपीट": "assault",
+    "हमला": "assault",
+    "चोट": "hurt",
+    "गंभीर": "grievous",
+    "दहेज": "dowry",
+    "आत्महत्या": "suicide",
+    "दुष्प्रेरण": "abetment",
+    "उकसाना": "abetment",
+    "मानहानि": "defamation",
+    "जालसाजी": "forgery",
+    "रिश्वत": "bribery",
+    "धमकी": "criminal intimidation",
+    "छेड़छाड़": "outraging modesty",
+    "पीछा": "stalking",
+    "तेजाब": "acid",
+    "जहर": "poison",
+    "विष": "poison",
+    "अपराध": "offence",
+    "अपराधी": "offender",
+    "जमानत": "bail",
+    "गिरफ्तारी": "arrest",
+    "शिकायत": "complaint",
+    "पुलिस": "police",
+    "अदालत": "court",
+    "न्यायालय": "court",
+    "सबूत": "evidence",
+    "साक्ष्य": "evidence",
+    "गवाह": "witness",
+    "झूठा": "false",
+    "झूठी": "false",
+    "संपत्ति": "property",
+    "महिला": "woman",
+    "स्त्री": "woman",
+    "बच्चा": "child",
+    "बच्चे": "child",
+    "पति": "husband",
+    "पत्नी": "wife",
+    "साइबर": "cyber",
+    "अश्लील": "obscene",
+    "क्या": "what",
+    "कितनी": "how much",
+    "कितना": "how much",
+    "और": "and",
+    "या": "or",
+}
+
+# Grammatical particles that carry no meaning for retrieval
+PARTICLES = {
+    "की", "का", "के", "में", "से", "पर", "को", "है", "हैं", "लिए", "होती", "होता",
+    "होगी", "होगा", "मिलती", "मिलता", "मिलेगी", "एक", "ने", "तो", "भी", "इस", "उस",
+    "यह", "वह", "जो", "गई", "गया",
+}
+
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+_PUNCT_RE = re.compile(r"[?!।,;:\"'“”‘’]")
+_PHRASES = sorted((p for p in GLOSSARY if " " in p), key=len, reverse=True)
+
+# (text, how it was produced): ascii | cache | glossary | network | partial | failed
+Translation = namedtuple("Translation", ["text", "source"])
+
+
+# --- 1. PERSISTENT CACHE ---
+class TranslationCache:
+    """
+    source -> English strings persisted as JSON. Writes go through a temp file
+    and os.replace, re-reading the file first so concurrent workers merge
+    rather than overwrite each other's entries.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable translation cache {self.path}: {e}")
+            return {}
+
+    def get(self, text):
+        return self._entries.get(text)
+
+    def put(self, text, translated):
+        with self._lock:
+            merged = self._read()
+            merged.update(self._entries)
+            merged[text] = translated
+            while len(merged) > self.max_entries:
+                merged.pop(next(iter(merged)))
+            self._entries = merged
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(merged, f, ensure_ascii=False, indent=0)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.warning(f"Could not persist translation cache: {e}")
+
+
+_cache = TranslationCache()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="translate")
+
+
+# --- 2. OFFLINE GLOSSARY ---
+def _normalize(text):
+    return " ".join(text.translate(_DEVANAGARI_DIGITS).split())
+
+def glossary_translate(text):
+    """
+    Word-by-word translation from GLOSSARY. Returns (translation, fully_covered);
+    words it does not know are kept as they are.
+    """
+    text = _PUNCT_RE.sub(" ", _normalize(text))
+    for phrase in _PHRASES:
+        text = text.replace(phrase, f" {GLOSSARY[phrase]} ")
+
+    words, covered = [], True
+    for word in text.split():
+        if word.isascii():
+            words.append(word)
+        elif word in GLOSSARY:
+            words.append(GLOSSARY[word])
+        elif word in PARTICLES:
+            continue
+        else:
+            words.append(word)
+            covered = False
+    return " ".join(words), covered
+
+
+# --- 3. TRANSLATION ---
+def _google(text):
+    return GoogleTranslator(source='auto', target='en').translate(text)
+
+def translate(text, timeout=TIMEOUT):
+    """
+    Translates a query to English: ASCII passes through, then the persistent
+    cache, then the glossary, then Google with a timeout. If Google fails the
+    partial glossary translation is used and the failure is logged.
+    """
+    if text.isascii():
+        return Translation(text, "ascii")
+
+    key = _normalize(text)
+    cached = _cache.get(key)
+    if cached is not None:
+        return Translation(cached, "cache")
+
+    offline, covered = glossary_translate(key)
+    if covered:
+        return Translation(offline, "glossary")
+
+    try:
+        translated = _executor.submit(_google, key).result(timeout=timeout)
+    except FutureTimeout:
+        logging.warning(f"Translation timed out after {timeout}s, using glossary fallback")
+        translated = None
+    except Exception as e:
+        logging.warning(f"Translation failed ({e}), using glossary fallback")
+        translated = None
+
+    if translated:
+        _cache.put(key, translated)
+        return Translation(translated, "network")
+    if any(word.isascii() for word in offline.split()):
+        return Translation(offline, "partial")
+    return Translation(key, "failed")
+
+def translate_query(text):
+    """English form of a (possibly Hindi) query."""
+    return translate(text).text
@@ -0,0 +1,129 @@
+"""
+Benchmark: ONNX Runtime embeddings (fp32 and int8) vs the PyTorch
+HuggingFaceEmbeddings path.
+
+Reports model load time, single-query latency (p50/p95, the retrieval critical
+path), batch throughput, and agreement with PyTorch: cosine similarity of the
+vectors and overlap of the top-10 statutes retrieved for each query.
+
+Usage (from backend/):
+    python -m benchmarks.bench_embeddings                          # bge-small-en-v1.5, 256 statutes
+    python -m benchmarks.bench_embeddings --model ../backend_doc/embedding_model --docs 512
+    python -m benchmarks.bench_embeddings --threads 1 2 4          # intra-op thread sweep
+
+The first run exports the model to ONNX (see onnx_embeddings.py).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from onnx_embeddings import ONNX_THREADS, OnnxEmbeddings, make_embeddings
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERY_REPEATS = 50
+TOP_K = 10
+QUERIES = [
+    "punishment for theft",
+    "snatching of a chain from a woman",
+    "cheating and dishonestly inducing delivery of property",
+    "murder punishment death or life imprisonment",
+    "criminal breach of trust by a public servant",
+    "sending offensive messages through a computer",
+    "dowry death within seven years of marriage",
+    "right of private defence of the body",
+    "kidnapping from lawful guardianship",
+    "defamation of a person by words spoken",
+    "organised crime committed by a syndicate",
+    "hacking a computer system with intent to cause loss",
+]
+
+
+def statute_texts(limit):
+    """Section texts from the IPC and BNS data, like the documents in legal_db."""
+    codes = []
+    for name in ("ipc_data.json", "bns_data.json"):
+        with open(os.path.join(DATA_DIR, name), 'r', encoding='utf-8') as f:
+            codes.append([f"{row['section_title']}. {row['section_desc']}"
+                          for row in json.load(f) if row.get("section_desc")])
+    # Interleave the two codes so a small --docs still covers both
+    return [text for pair in zip(*codes) for text in pair][:limit]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def query_latency_ms(model):
+    model.embed_query(QUERIES[0])  # first call pays for lazy initialisation
+    runs = []
+    for i in range(QUERY_REPEATS):
+        start = time.perf_counter()
+        model.embed_query(QUERIES[i % len(QUERIES)])
+        runs.append((time.perf_counter() - start) * 1000)
+    runs.sort()
+    return statistics.median(runs), runs[int(len(runs) * 0.95) - 1]
+
+
+def normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def top_k_overlap(query_a, docs_a, query_b, docs_b):
+    overlaps = []
+    for qa, qb in zip(query_a, query_b):
+        top_a = set(np.argsort(-(docs_a @ qa))[:TOP_K])
+        top_b = set(np.argsort(-(docs_b @ qb))[:TOP_K])
+        overlaps.append(len(top_a & top_b) / TOP_K)
+    return statistics.mean(overlaps)
+
+
+def run(name, load, docs, reference=None):
+    model, load_s = timed(load)
+    p50, p95 = query_latency_ms(model)
+    doc_vectors, batch_s = timed(lambda: model.embed_documents(docs))
+    doc_vectors = normalized(doc_vectors)
+    query_vectors = normalized([model.embed_query(q) for q in QUERIES])
+
+    row = f"{name:<22}{load_s:>8.1f}{p50:>9.1f}{p95:>9.1f}{len(docs) / batch_s:>11.0f}"
+    if reference is not None:
+        ref_docs, ref_queries = reference
+        doc_cos = (doc_vectors * ref_docs).sum(axis=1)
+        query_cos = (query_vectors * ref_queries).sum(axis=1)
+        overlap = top_k_overlap(ref_queries, ref_docs, query_vectors, doc_vectors)
+        row += f"{doc_cos.mean():>10.4f}{min(doc_cos.min(), query_cos.min()):>10.4f}{overlap:>10.0%}"
+    print(row)
+    return doc_vectors, query_vectors
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compare ONNX Runtime and PyTorch embedding backends.")
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5", help="hub id or local model directory")
+    parser.add_argument("--docs", type=int, default=256, help="statute texts to embed")
+    parser.add_argument("--threads", type=int, nargs="+", default=[ONNX_THREADS], help="intra-op threads to try")
+    args = parser.parse_args(argv)
+
+    docs = statute_texts(args.docs)
+    print(f"📚 {args.model}: {len(docs)} statute texts, {len(QUERIES)} queries\n")
+    print(f"{'backend':<22}{'load s':>8}{'q p50':>9}{'q p95':>9}{'docs/s':>11}"
+          f"{'cos mean':>10}{'cos min':>10}{'top-10':>10}")
+
+    reference = run("torch", lambda: make_embeddings(args.model, normalize=True, backend="torch"), docs)
+    for threads in args.threads:
+        for quantize in (False, True):
+            name = f"onnx {'int8' if quantize else 'fp32'} x{threads}"
+            run(name, lambda: OnnxEmbeddings(args.model, quantize=quantize, threads=threads, normalize=True),
+                docs, reference)
+    print("\nLatency in ms; cosine and top-10 overlap are against the torch vectors.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
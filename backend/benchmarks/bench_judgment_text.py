@@ -0,0 +1,105 @@
+"""
+Benchmark: judgment_text.extract_text vs the old BeautifulSoup cleanup.
+
+Usage (from backend/):
+    python -m benchmarks.bench_judgment_text                     # recorded HTML in benchmarks/judgments/
+    python -m benchmarks.bench_judgment_text path/to/*.html
+    python -m benchmarks.bench_judgment_text --record 1560742 ...  # save raw Kanoon HTML first
+
+Falls back to a synthetic Kanoon-style judgment when nothing is recorded.
+"""
+import glob
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bs4 import BeautifulSoup
+from judgment_text import extract_text
+
+RECORD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "judgments")
+REPEATS = 20
+
+
+def legacy_clean_html(html):
+    """The pre-streaming implementation of get_clean_verdict_text, kept for comparison."""
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.extract()
+    text = soup.get_text(separator="\n\n")
+    return "\n".join([line.strip() for line in text.splitlines() if line.strip()])
+
+
+def synthetic_judgment(paragraphs=1200):
+    body = []
+    for i in range(1, paragraphs + 1):
+        body.append(
+            f'<p id="p_{i}" data-structure="Analysis">{i}. The learned counsel for the '
+            f'<b>appellant</b> submitted that <a href="/doc/1569253/">Section 302</a> of the '
+            f'Indian Penal Code was not attracted &amp; relied on the decision in '
+            f'<i>State of Maharashtra v. Ramesh</i>, (2019) 4 SCC {i}.</p>'
+        )
+    return (
+        "<html><head><style>p {margin: 0}</style><script>var x = 1;</script></head>"
+        '<body><div class="judgments"><h2 class="doc_title">A v. State</h2>'
+        + "".join(body)
+        + "<p>The appeal is accordingly dismissed.</p></div></body></html>"
+    )
+
+
+def record(doc_ids):
+    import indian_kanoon_lib as ik_api
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    for doc_id in doc_ids:
+        data = ik_api._make_request(f"doc/{doc_id}/")
+        if not data or 'doc' not in data:
+            print(f"❌ Could not fetch {doc_id}")
+            continue
+        with open(os.path.join(RECORD_DIR, f"{doc_id}.html"), 'w', encoding='utf-8') as f:
+            f.write(data['doc'])
+        print(f"💾 Recorded {doc_id}")
+
+
+def time_ms(fn, html):
+    runs = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(html)
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+def word_agreement(a, b):
+    """Share of words (as a multiset) the two extractions have in common."""
+    wa, wb = Counter(a.split()), Counter(b.split())
+    total = max(sum(wa.values()), sum(wb.values()), 1)
+    return sum((wa & wb).values()) / total
+
+
+def main(argv):
+    if argv[:1] == ["--record"]:
+        record(argv[1:])
+        return
+
+    paths = argv or sorted(glob.glob(os.path.join(RECORD_DIR, "*.html")))
+    samples = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            samples.append((os.path.basename(path), f.read()))
+    if not samples:
+        print("ℹ️  No recorded judgments found, using a synthetic one.")
+        samples = [("synthetic", synthetic_judgment())]
+
+    print(f"{'document':<24}{'KB':>8}{'legacy ms':>12}{'stream ms':>12}{'speedup':>10}{'words':>8}")
+    for name, html in samples:
+        legacy = time_ms(legacy_clean_html, html)
+        stream = time_ms(extract_text, html)
+        agreement = word_agreement(legacy_clean_html(html), extract_text(html))
+        print(f"{name:<24}{len(html) / 1024:>8.0f}{legacy:>12.2f}{stream:>12.2f}"
+              f"{legacy / stream:>9.1f}x{agreement:>8.1%}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Optional, Tuple
+
+# --- CONFIGURATION ---
+CACHE_PATH = os.getenv(
+    "COMPARE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "compare_cache.sqlite3"))
+# Seconds after which an entry is stale (refreshed in the background); 0 = never stale
+MAX_AGE = float(os.getenv("COMPARE_CACHE_MAX_AGE", "0"))
+SERVE_STALE = os.getenv("COMPARE_CACHE_SERVE_STALE", "1") == "1"
+
+# Everything that can change a /compare answer
+CompareKey = namedtuple("CompareKey", ["law", "section", "corpus_version", "model", "prompt_version"])
+
+# Section number with its letter suffix and sub-sections: "2", "2(1)", "498A", "376AB(2)"
+# (at most two letters, so "420 of IPC" with spaces removed still reads as 420)
+SECTION_RE = re.compile(r'\d+(?:[A-Z]{1,2}(?![A-Z]))?(\(\w+\))*', re.IGNORECASE)
+
+
+def normalize_section(law: str, section: str, subsection: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Canonical (law, section id) for a /compare request, matching what
+    LegalBackend.process_query will look up: ("BNS", "2(1)"), ("IPC", "420").
+    Section is None when no section number can be found.
+    """
+    law = "BNS" if "BNS" in law.upper() else "IPC"
+    sec_id = re.sub(r"\s+", "", section or "").upper()
+
+    # Only BNS supports subsection
+    if law == "BNS" and subsection:
+        clean_sub = re.sub(r"[\s()]", "", subsection).upper()
+        if clean_sub:
+            sec_id = f"{sec_id}({clean_sub})"
+
+    match = SECTION_RE.search(sec_id)
+    return law, (match.group(0) if match else None)
+
+
+class CompareCache:
+    """
+    Durable /compare response cache in SQLite (WAL mode), shared by every
+    uvicorn worker and by the batch precompute job on the same host. One
+    connection per thread.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_age: float = MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS compare_cache (
+                    law TEXT NOT NULL,
+                    section TEXT NOT NULL,
+                    corpus_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (law, section, corpus_version, model, prompt_version)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: CompareKey) -> Optional[Tuple[dict, bool]]:
+        """Returns (payload, is_stale) or None."""
+        row = self._connect().execute(
+            "SELECT payload, created_at FROM compare_cache WHERE law=? AND section=? "
+            "AND corpus_version=? AND model=? AND prompt_version=?",
+            tuple(key),
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        stale = bool(self.max_age) and time.time() - row[1] > self.max_age
+        with self._lock:
+            self.hits += 1
+            self.stale_hits += stale
+        return json.loads(row[0]), stale
+
+    def put(self, key: CompareKey, payload: dict, source: str = "live") -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO compare_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(key) + (json.dumps(payload, ensure_ascii=False), source, time.time()),
+            )
+
+    def contains(self, key: CompareKey) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM compare_cache WHERE law=? AND section=? "
+            "AND corpus_version=? AND model=? AND prompt_version=?",
+            tuple(key),
+        ).fetchone()
+        return row is not None
+
+    def invalidate(self, law: Optional[str] = None, section: Optional[str] = None) -> int:
+        """Deletes matching entries (all of them when no filter is given); returns the count."""
+        clauses, params = [], []
+        if law:
+            clauses.append("law = ?")
+            params.append(law)
+        if section:
+            clauses.append("section = ?")
+            params.append(section)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            return conn.execute(f"DELETE FROM compare_cache{where}", params).rowcount
+
+    def stats(self) -> dict:
+        rows = self._connect().execute(
+            "SELECT source, COUNT(*) FROM compare_cache GROUP BY source").fetchall()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": dict(rows),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
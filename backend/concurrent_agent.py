@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+from langchain_classic.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+
+# --- CONFIGURATION ---
+TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))  # tool calls run at once per model turn
+TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", "60"))       # seconds, unless overridden per tool
+
+# Tool calls requested by the current model turn (sync path)
+_batch: contextvars.ContextVar[Optional["_ToolBatch"]] = contextvars.ContextVar("tool_batch", default=None)
+# Concurrency cap for the current model turn (async path)
+_step_semaphore: contextvars.ContextVar[Optional[asyncio.Semaphore]] = contextvars.ContextVar(
+    "tool_step_semaphore", default=None)
+
+
+class _ToolBatch:
+    def __init__(self):
+        self.actions: List[AgentAction] = []
+        self.steps: Optional[List[AgentStep]] = None
+        self.served = 0
+
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that runs the tool calls of one model turn concurrently.
+
+    When Gemini asks for several tools at once (e.g. read_full_judgment for
+    three ids), they run in parallel, at most max_tool_concurrency at a time,
+    so the turn takes as long as its slowest call. Observations are returned
+    in the order the model asked for them. A call that exceeds its timeout
+    (tool_timeouts[name] or default_tool_timeout) becomes an error
+    observation the model can react to, instead of stalling the run.
+    """
+
+    max_tool_concurrency: int = TOOL_CONCURRENCY
+    tool_timeouts: Dict[str, float] = {}
+    default_tool_timeout: float = TOOL_TIMEOUT
+
+    def _timeout_for(self, tool_name: str) -> float:
+        return self.tool_timeouts.get(tool_name, self.default_tool_timeout)
+
+    def _timeout_step(self, agent_action: AgentAction) -> AgentStep:
+        timeout = self._timeout_for(agent_action.tool)
+        print(f"⏱️ Tool '{agent_action.tool}' timed out after {timeout:g}s")
+        return AgentStep(
+            action=agent_action,
+            observation=f"Error: '{agent_action.tool}' did not finish within {timeout:g} seconds. "
+                        f"Continue with the information you have or try a narrower request.",
+        )
+
+    # --- SYNC PATH (invoke) ---
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        # langchain-classic 1.0.x (pinned in pyproject.toml) yields every
+        # requested action before performing the first one, so the whole turn
+        # is known when _perform_agent_action runs. Re-check on upgrades.
+        batch = _ToolBatch()
+        token = _batch.set(batch)
+        try:
+            for item in super()._iter_next_step(
+                    name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+                if isinstance(item, AgentAction):
+                    batch.actions.append(item)
+                yield item
+        finally:
+            _batch.reset(token)
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        batch = _batch.get()
+        if batch is None or agent_action not in batch.actions:
+            batch = _ToolBatch()
+            batch.actions.append(agent_action)
+        if batch.steps is None:
+            batch.steps = self._run_batch(batch.actions, name_to_tool_map, color_mapping, run_manager)
+        step = batch.steps[batch.served]
+        batch.served += 1
+        return step
+
+    def _run_batch(self, actions, name_to_tool_map, color_mapping, run_manager) -> List[AgentStep]:
+        perform = super()._perform_agent_action
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_tool_concurrency, len(actions))),
+                                      thread_name_prefix="agent-tool")
+        try:
+            # Each call keeps the caller's context (e.g. the active question)
+            futures = [
+                executor.submit(contextvars.copy_context().run, perform,
+                                name_to_tool_map, color_mapping, action, run_manager)
+                for action in actions
+            ]
+            # Every call's clock starts at submission, not when the previous result arrived
+            deadlines = [started + self._timeout_for(action.tool) for action in actions]
+            steps = []
+            for action, future, deadline in zip(actions, futures, deadlines):
+                try:
+                    steps.append(future.result(timeout=max(0, deadline - time.monotonic())))
+                except FutureTimeout:
+                    future.cancel()
+                    steps.append(self._timeout_step(action))
+        finally:
+            # Timed-out calls cannot be interrupted; let them finish in the background
+            executor.shutdown(wait=False)
+        if len(actions) > 1:
+            print(f"⚡ Ran {len(actions)} tool calls concurrently in {time.monotonic() - started:.1f}s")
+        return steps
+
+    # --- ASYNC PATH (ainvoke / astream_events) ---
+    async def _aiter_next_step(self, *args, **kwargs):
+        # The base class already gathers the turn's tool calls; cap them per turn
+        _step_semaphore.set(asyncio.Semaphore(self.max_tool_concurrency))
+        async for item in super()._aiter_next_step(*args, **kwargs):
+            yield item
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        async with _step_semaphore.get() or nullcontext():
+            task = asyncio.ensure_future(
+                super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager))
+            # asyncio.wait (not wait_for) so a sync tool stuck in its thread
+            # cannot hold the turn after its timeout
+            done, _ = await asyncio.wait({task}, timeout=self._timeout_for(agent_action.tool))
+            if task in done:
+                return task.result()
+            task.cancel()
+            return self._timeout_step(agent_action)
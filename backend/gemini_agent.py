@@ -1,5 +1,6 @@
 import sys
 from gemini_agent_core import GeminiLegalAgent
+from rate_limiter import AGENT, call_with_retries_sync
 
 def main():
     agent = GeminiLegalAgent()
@@ -10,7 +11,8 @@ def main():
             if user_input.lower() in ["quit", "exit"]:
                 print("\n👋 Exiting...")
                 break
-            response = agent.query(user_input)
+            response = call_with_retries_sync(
+                lambda: agent.query(user_input, session_id="cli"), agent.limiter, priority=AGENT)
             print(f"\n🤖 NyayaSetu: {response}")
         except KeyboardInterrupt:
             print("\n👋 Exiting...")
@@ -1,43 +1,96 @@
 import os
-import time
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_classic.agents import AgentExecutor, create_tool_calling_agent
+from langchain_classic.agents import create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.tools import tool
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from deep_translator import GoogleTranslator
 
 # IMPORT YOUR NEW LIBRARY
 import indian_kanoon_lib as ik_api
+from session_store import make_session_store
+from prompt_history import HistoryAssembler
+from judgment_passages import active_query, select_passages
+from concurrent_agent import ConcurrentAgentExecutor
+from resources import registry
+from onnx_embeddings import make_embeddings
+from rate_limiter import AGENT, BucketRateLimiter, get_bucket, is_rate_limit_error
 
 # Import hybrid retrieval engine
-from RAG_Builder.hybrid_retriveal import load_bm25_retriever, translate_query, perform_hybrid_search
+from RAG_Builder.hybrid_retriveal import load_bm25_retriever, load_section_vectors, translate_query, perform_hybrid_search
+from RAG_Builder.search_cache import SearchCache, index_fingerprint
 
 # --- CONFIGURATION ---
 DB_DIRECTORY = os.path.join(os.path.dirname(
     __file__), "RAG_Builder", "legal_db")
 MODEL_NAME = "BAAI/bge-small-en-v1.5"
+GEMINI_MODEL = "gemini-3-flash-preview"
+TOKENS_PER_LLM_CALL = 4000  # quota taken per Gemini call (prompt + tool results + answer, estimated)
+MAX_RETRIES = 3
 CONFIDENCE_THRESHOLD = 0.35
-MAX_DOC_LENGTH = 100000  # Keeping this safe to avoid constant timeouts
+SEARCH_PARAMS = {"vector_k": 15, "keyword_k": 15, "mmr_k": 6, "lambda_mult": 0.5}
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 6 * 60 * 60  # seconds
+# Seconds a single tool call may take before the agent gets an error observation
+TOOL_TIMEOUTS = {
+    "search_legal_database": 30,
+    "find_case_law": 30,
+    "read_full_judgment": 90,  # download + passage ranking
+    "check_statute_usage": 30,
+}
 
-print(f"⏳ Loading Legal Database...")
-embedding_function = HuggingFaceEmbeddings(
-    model_name=MODEL_NAME,
-    model_kwargs={'device': 'cpu'},
-    encode_kwargs={'normalize_embeddings': True}
-)
+WARMUP_QUERY = "punishment for theft"  # synthetic statute search run by the warm-up
+
+
+# --- RESOURCES (loaded on first use or in the background, see resources.py) ---
+def _load_embeddings():
+    # EMBEDDING_BACKEND=onnx swaps in the quantized ONNX Runtime model (onnx_embeddings.py)
+    return make_embeddings(MODEL_NAME, normalize=True)
+
+
+def _load_vector_db():
+    if not os.path.exists(DB_DIRECTORY):
+        print(f"❌ Database not found. RAG functionality will be limited.")
+        return None
+    return Chroma(persist_directory=DB_DIRECTORY,
+                  embedding_function=registry.get("embeddings"))
+
+
+def _load_bm25():
+    return load_bm25_retriever() if os.path.exists(DB_DIRECTORY) else None
 
-if os.path.exists(DB_DIRECTORY):
-    db = Chroma(persist_directory=DB_DIRECTORY,
-                embedding_function=embedding_function)
-    bm25_retriever = load_bm25_retriever()
-    print(f"✅ Connected to ChromaDB and BM25 Retriever")
-else:
-    print(f"❌ Database not found. RAG functionality will be limited.")
-    db = None
-    bm25_retriever = None
+
+def _load_section_vectors():
+    # Stored section vectors, so MMR never has to re-embed candidates
+    db = registry.get("vector_db")
+    return load_section_vectors(db) if db is not None else {}
+
+
+def _warm_up_search():
+    # Straight to the retrieval stack: no translation call and nothing cached
+    db, bm25_retriever = registry.get("vector_db"), registry.get("bm25")
+    if db is not None and bm25_retriever is not None:
+        perform_hybrid_search(WARMUP_QUERY, db, bm25_retriever, registry.get("section_vectors"), **SEARCH_PARAMS)
+    registry.get("embeddings").embed_documents([WARMUP_QUERY])
+
+
+registry.register("embeddings", _load_embeddings)
+registry.register("vector_db", _load_vector_db)
+registry.register("bm25", _load_bm25)
+registry.register("section_vectors", _load_section_vectors)
+registry.add_warmup("statute_search", _warm_up_search)
+
+# Repeat statute lookups skip embedding, Chroma, BM25 and MMR entirely.
+# Rebuilding legal_db or the BM25 artifact changes the fingerprint and clears it.
+search_cache = SearchCache(
+    maxsize=SEARCH_CACHE_SIZE,
+    ttl=SEARCH_CACHE_TTL,
+    version_fn=lambda: index_fingerprint(
+        DB_DIRECTORY, getattr(registry.peek("bm25"), "path", None))
+)
 
 # --- TOOLS DEFINITION ---
 
@@ -48,11 +101,17 @@ def search_legal_database(query: str) -> str:
     Search for STATUTES, DEFINITIONS, or PUNISHMENTS in IPC/BNS/IT Act using hybrid retrieval.
     Input: A specific legal topic (e.g., "punishment for snatching", "Section 302 text").
     """
+    db, bm25_retriever = registry.get("vector_db"), registry.get("bm25")
     if db is None or bm25_retriever is None:
         return "Error: Database not connected."
 
     clean_query = translate_query(query)
-    results = perform_hybrid_search(clean_query, db, bm25_retriever)
+    cache_key = search_cache.make_key(clean_query, **SEARCH_PARAMS)
+    results = search_cache.get(cache_key)
+    if results is None:
+        results = perform_hybrid_search(
+            clean_query, db, bm25_retriever, registry.get("section_vectors"), **SEARCH_PARAMS)
+        search_cache.put(cache_key, results)
 
     if not results:
         return "No specific statutes found in the database."
@@ -88,14 +147,19 @@ def find_case_law(topic: str, court: str = "supremecourt") -> str:
 
 
 @tool
-def read_full_judgment(doc_id: int) -> str:
+def read_full_judgment(doc_id: int, focus: str = "") -> str:
     """
-    Reads the FULL TEXT of a judgment.
+    Reads a judgment: its passages most relevant to the question plus the final operative order.
     MANDATORY: Use this after 'find_case_law' to verify the verdict.
+    Args:
+        doc_id: Indian Kanoon document ID from 'find_case_law'.
+        focus: Optional - what to look for in the judgment (defaults to the user's question).
     """
     print(f"📖 Reading Full Text for Doc ID: {doc_id}...")
     text = ik_api.get_clean_verdict_text(doc_id)
-    return text[:MAX_DOC_LENGTH] + "... [Truncated]"
+    if text.startswith("Error:"):
+        return text
+    return select_passages(text, focus or active_query.get(), doc_id, registry.get("embeddings"))
 
 
 @tool
@@ -114,6 +178,27 @@ def check_statute_usage(section: str, act: str) -> str:
     return "\n".join(output)
 
 
+_SECTION_RE = re.compile(r"^Act: (.+)\nSection: (.+)$", re.MULTILINE)
+_CASE_ID_RE = re.compile(r"^ID: (\d+)", re.MULTILINE)
+
+
+def _tool_findings(output) -> Dict[str, List]:
+    """Sections and Indian Kanoon case ids mentioned in a tool's output."""
+    text = output if isinstance(output, str) else str(output or "")
+    return {
+        "sections": [{"act": act, "section": section} for act, section in _SECTION_RE.findall(text)],
+        "case_ids": [int(doc_id) for doc_id in _CASE_ID_RE.findall(text)],
+    }
+
+
+def _chunk_text(content) -> str:
+    """Text of a streamed chat chunk; Gemini may send a list of content parts."""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content
+                   if isinstance(part, dict) and part.get("type", "text") == "text")
+
+
 class GeminiLegalAgent:
     def __init__(self):
         load_dotenv()
@@ -123,10 +208,13 @@ class GeminiLegalAgent:
             raise ValueError(
                 "❌ Google API Key missing! Please set GOOGLE_API_KEY in your .env file")
 
+        # Shared with every worker; each model call of a run takes quota first
+        self.limiter = get_bucket("gemini", GEMINI_MODEL)
         self.llm = ChatGoogleGenerativeAI(
-            model="gemini-3-flash-preview",
+            model=GEMINI_MODEL,
             temperature=0.3,
-            google_api_key=self.api_key
+            google_api_key=self.api_key,
+            rate_limiter=BucketRateLimiter(self.limiter, priority=AGENT, tokens_per_call=TOKENS_PER_LLM_CALL),
         )
 
         self.tools = [
@@ -169,89 +257,120 @@ class GeminiLegalAgent:
         ])
 
         agent = create_tool_calling_agent(self.llm, self.tools, self.prompt)
-        self.agent_executor = AgentExecutor(
+        # Tool calls from one model turn run concurrently, results kept in order
+        self.agent_executor = ConcurrentAgentExecutor(
             agent=agent,
             tools=self.tools,
             verbose=True,
             max_iterations=None,
+            tool_timeouts=TOOL_TIMEOUTS,
         )
 
-        # Simple in-memory conversation history so the agent can
-        # handle follow-up questions using prior context.
-        # Each entry: {"user": str, "assistant": str}
-        self.conversation_history = []
-
-    def query(self, user_input: str) -> str:
-        """Process a legal query with retry logic and simple memory."""
-
-        max_retries = 3
+        # Conversation history per session id, so the agent can handle
+        # follow-up questions using that user's own prior context.
+        # Each turn: {"user": str, "assistant": str}
+        self.sessions = make_session_store()
+        # Keeps the history part of every prompt within a fixed token budget
+        self.history = HistoryAssembler()
+
+    def _compose_input(self, user_input: str, session_id: Optional[str] = None) -> str:
+        """Prefix the session's history, within the token budget, so follow-ups are understood in context."""
+        conversation_history = self.sessions.get(session_id) if session_id else []
+        composed_input, stats = self.history.assemble(conversation_history, user_input)
+        if stats["turns"]:
+            print(f"🧾 History: {stats['verbatim']} verbatim, {stats['compacted']} compacted, "
+                  f"{stats['dropped']} dropped, ~{stats['history_tokens']}/{stats['budget']} tokens")
+        return composed_input
+
+    @staticmethod
+    def _extract_text(output) -> str:
+        """Clean text from a Gemini response (plain string or a list of content parts)."""
+        if isinstance(output, list) and len(output) > 0:
+            if isinstance(output[0], dict) and "text" in output[0]:
+                return output[0]["text"]
+            return str(output)
+        return str(output)
+
+    def _remember(self, session_id: Optional[str], user_input: str, final_text: str):
+        # Store this turn in the session's history for future follow-up queries
+        if session_id:
+            self.sessions.append(session_id, user_input, final_text)
+
+    def query(self, user_input: str, session_id: Optional[str] = None) -> str:
+        """
+        Process a legal query in one agent run. Turns are remembered per
+        session_id; without one the query is answered statelessly.
+        When Gemini's quota is exhausted this raises RateLimited (after
+        pausing the shared bucket) instead of sleeping; callers schedule the
+        retry with rate_limiter.call_with_retries.
+        """
+        # Lets read_full_judgment rank passages against this question
+        query_token = active_query.set(user_input)
+        try:
+            response = self.agent_executor.invoke(
+                {"input": self._compose_input(user_input, session_id)})
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise self.limiter.penalize(e) from e
+            raise
+        finally:
+            active_query.reset(query_token)
+
+        final_text = self._extract_text(response["output"])
+        self._remember(session_id, user_input, final_text)
+        return final_text
+
+    async def astream(self, user_input: str, session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams one query as events while the agent works:
+          {"type": "tool_start", "tool", "input"}
+          {"type": "tool_end", "tool", "sections", "case_ids"}
+          {"type": "token", "text"}     (answer text as Gemini produces it)
+          {"type": "final", "response"} (identical to what query() returns)
+        Rate limits are retried once the shared bucket reopens, but only
+        before anything was sent.
+        """
         attempt = 0
-
-        while attempt < max_retries:
-            try:
-                # Build conversational context from recent turns so that
-                # follow-up questions are understood in context.
-                if self.conversation_history:
-                    recent_history = self.conversation_history[-5:]
-                    history_blocks = []
-                    for turn in recent_history:
-                        history_blocks.append(
-                            f"User: {turn['user']}\nAssistant: {turn['assistant']}"
-                        )
-
-                    history_text = "\n\n".join(history_blocks)
-                    composed_input = (
-                        "Below is the previous conversation between the user and you. "
-                        "Use it as context to answer the user's new follow-up question.\n\n"
-                        f"{history_text}\n\n"
-                        f"User: {user_input}\nAssistant:"
-                    )
-                else:
-                    composed_input = user_input
-
-                response = self.agent_executor.invoke(
-                    {"input": composed_input})
-
-                # Extract clean text from Gemini response
-                output = response["output"]
-                if isinstance(output, list) and len(output) > 0:
-                    if isinstance(output[0], dict) and "text" in output[0]:
-                        final_text = output[0]["text"]
-                    else:
-                        final_text = str(output)
-                else:
-                    final_text = str(output)
-
-                # Store this turn in history for future follow-up queries
-                self.conversation_history.append(
-                    {
-                        "user": user_input,
-                        "assistant": final_text,
-                    }
-                )
-
-                return final_text
-
-            except Exception as e:
-                error_msg = str(e).lower()
-
-                # Check for Rate Limit errors (429) or quota exceeded
-                if (
-                    "429" in error_msg
-                    or "rate_limit" in error_msg
-                    or "quota" in error_msg
-                    or "resource_exhausted" in error_msg
-                ):
-                    wait_time = 65  # Wait 65 seconds to be safe
-                    print(
-                        f"\n⚠️ Rate Limit/Quota Hit. Auto-waiting {wait_time}s before retry ({attempt+1}/{max_retries})..."
-                    )
-                    time.sleep(wait_time)
+        # Tools run in a copy of this context, so they see the active question
+        query_token = active_query.set(user_input)
+        try:
+            while True:
+                sent = False
+                try:
+                    async for event in self.agent_executor.astream_events(
+                            {"input": self._compose_input(user_input, session_id)}, version="v2"):
+                        kind = event["event"]
+                        if kind == "on_tool_start":
+                            sent = True
+                            yield {"type": "tool_start", "tool": event["name"],
+                                   "input": event["data"].get("input")}
+                        elif kind == "on_tool_end":
+                            sent = True
+                            output = event["data"].get("output")
+                            yield {"type": "tool_end", "tool": event["name"],
+                                   **_tool_findings(getattr(output, "content", output))}
+                        elif kind == "on_chat_model_stream":
+                            text = _chunk_text(event["data"]["chunk"].content)
+                            if text:
+                                sent = True
+                                yield {"type": "token", "text": text}
+                        elif kind == "on_chain_end" and not event.get("parent_ids"):
+                            final_text = self._extract_text(event["data"]["output"]["output"])
+                            self._remember(session_id, user_input, final_text)
+                            yield {"type": "final", "response": final_text}
+                            return
+
+                except Exception as e:
+                    if not is_rate_limit_error(e) or sent:
+                        raise
+                    limited = self.limiter.penalize(e)
+                    if attempt == MAX_RETRIES:
+                        raise limited from e
                     attempt += 1
-                else:
-                    # If it's a real error (not rate limit), raise it
-                    raise e
-
-        raise Exception(
-            "Failed after 3 retries due to rate limiting. Please try again later."
-        )
+                    print(f"⏳ Gemini rate limited; retry {attempt}/{MAX_RETRIES} scheduled in {limited.retry_after:.0f}s")
+                    await self.limiter.acquire(priority=AGENT, max_wait=3 * limited.retry_after + 30, consume=False)
+        finally:
+            try:
+                active_query.reset(query_token)
+            except ValueError:
+                pass  # Closed from another context (e.g. loop shutdown), which never saw the value
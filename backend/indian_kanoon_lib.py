@@ -1,9 +1,15 @@
+import asyncio
+import math
+import random
+import time
 import requests
-from bs4 import BeautifulSoup
+import httpx
 import logging
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict
 import os
 from dotenv import load_dotenv
+from judgment_cache import JudgmentCache
+from judgment_text import FORMAT_VERSION as TEXT_FORMAT_VERSION, extract_text
 
 # --- CONFIGURATION ---
 # Load environment variables from .env file
@@ -11,62 +17,271 @@ load_dotenv()
 API_TOKEN = os.getenv('INDIAN_KANOON_API_TOKEN')
 BASE_URL = 'https://api.indiankanoon.org'
 
+TIMEOUT = float(os.getenv('INDIAN_KANOON_TIMEOUT', '20'))            # seconds per request
+MAX_CONCURRENCY = int(os.getenv('INDIAN_KANOON_MAX_CONCURRENCY', '8'))  # in-flight calls per worker
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5      # seconds; doubled on every retry, with full jitter
+BACKOFF_MAX = 10.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+PAGE_SIZE = 10          # results per Kanoon search page
+MAX_PAGES = 10          # upper bound on pages fetched for one search
+PAGE_CONCURRENCY = 4    # search pages fetched in parallel for one request
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# One keep-alive session shared by every synchronous call
+_session = requests.Session()
+
+# Published judgments never change, so cleaned text is kept on local disk
+judgment_cache = JudgmentCache(version=TEXT_FORMAT_VERSION)
+
+# The async client and semaphore belong to the event loop that created them
+_async_client: Optional[httpx.AsyncClient] = None
+_async_semaphore: Optional[asyncio.Semaphore] = None
+_async_loop = None
+
+
+class SearchFailed(RuntimeError):
+    """Indian Kanoon gave no answer for the first page of a search (as opposed to no matches)."""
+
+
+def _headers() -> Dict:
+    return {
+        'Authorization': f'Token {API_TOKEN}',
+        'Accept': 'application/json'
+    }
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Honours a numeric Retry-After, otherwise exponential backoff with full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
 def _make_request(endpoint: str, params: Optional[Dict] = None, method: str = 'POST') -> Optional[Dict]:
     """Internal helper to handle authentication and error catching."""
     if not API_TOKEN:
         logging.error("INDIAN_KANOON_API_TOKEN not set in environment.")
         return None
-    headers = {
-        'Authorization': f'Token {API_TOKEN}',
-        'Accept': 'application/json'
-    }
     url = f"{BASE_URL}/{endpoint}"
     try:
-        if method == 'POST':
-            response = requests.post(url, headers=headers, data=params)
-        else:
-            response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        for attempt in range(MAX_RETRIES + 1):
+            if method == 'POST':
+                response = _session.post(url, headers=_headers(), data=params, timeout=TIMEOUT)
+            else:
+                response = _session.get(url, headers=_headers(), params=params, timeout=TIMEOUT)
+            if response.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+                time.sleep(_retry_delay(attempt, response.headers.get('Retry-After')))
+                continue
+            response.raise_for_status()
+            return response.json()
     except Exception as err:
         logging.error(f"Request Failed: {err}")
         return None
 
-def search_legal_cases(query: str, court: Optional[str] = None, max_cites: int = 5) -> Dict:
+def _kanoon_date(date: str) -> str:
+    """Kanoon expects DD-MM-YYYY; accept ISO YYYY-MM-DD as well."""
+    parts = date.strip().split("-")
+    if len(parts) == 3 and len(parts[0]) == 4:
+        return f"{parts[2]}-{parts[1]}-{parts[0]}"
+    return date.strip()
+
+def _search_params(query: str, court: Optional[str], max_cites: int,
+                   from_date: Optional[str] = None, to_date: Optional[str] = None,
+                   pagenum: int = 0) -> Dict:
+    params = {'formInput': query, 'maxcites': max_cites, 'pagenum': pagenum}
+    if court:
+        params['doctypes'] = court
+    if from_date:
+        params['fromdate'] = _kanoon_date(from_date)
+    if to_date:
+        params['todate'] = _kanoon_date(to_date)
+    return params
+
+def _section_query(section: str, act: str) -> str:
+    # Construct strict query: "Section X" ANDD "Act Name"
+    return f'"Section {section}" ANDD "{act}"'
+
+def search_legal_cases(query: str, court: Optional[str] = None, max_cites: int = 5,
+                       from_date: Optional[str] = None, to_date: Optional[str] = None,
+                       pagenum: int = 0) -> Dict:
     """
     Searches for legal cases.
     Args:
         query: The search term (e.g., "defamation" or "murder ANDD kidnapping").
         court: Filter by court (e.g., 'supremecourt', 'highcourts', 'delhi').
+        from_date / to_date: Publication date bounds, 'YYYY-MM-DD' or 'DD-MM-YYYY'.
+        pagenum: Result page (0-based, PAGE_SIZE results each).
     """
-    params = {'formInput': query, 'maxcites': max_cites}
-    if court:
-        params['doctypes'] = court
+    params = _search_params(query, court, max_cites, from_date, to_date, pagenum)
     return _make_request("search/", params=params)
 
 def search_by_section(section: str, act: str) -> Dict:
     """
     Searches for cases specifically citing a Law Section (e.g., Section 302 IPC).
     """
-    # Construct strict query: "Section X" ANDD "Act Name"
-    query = f'"Section {section}" ANDD "{act}"'
-    return search_legal_cases(query=query)
+    return search_legal_cases(query=_section_query(section, act))
 
 def get_clean_verdict_text(doc_id: int) -> str:
     """
     Fetches a document and strips HTML to return clean text for the LLM.
     """
+    cached = judgment_cache.get(doc_id)
+    if cached is not None:
+        return cached
+
     data = _make_request(f"doc/{doc_id}/")
     if not data or 'doc' not in data:
         return "Error: Document content not found."
+    text = extract_text(data['doc'])
+    judgment_cache.put(doc_id, text)
+    return text
+
 
-    soup = BeautifulSoup(data['doc'], "html.parser")
-    for script in soup(["script", "style"]):
-        script.extract()
-    
-    # Get text with double newlines for paragraphs
-    text = soup.get_text(separator="\n\n")
-    return "\n".join([line.strip() for line in text.splitlines() if line.strip()])
\ No newline at end of file
+# ==========================================
+# ASYNC CLIENT (for the FastAPI endpoints)
+# ==========================================
+
+def _get_async_client():
+    """Returns the pooled client and concurrency cap for the running event loop."""
+    global _async_client, _async_semaphore, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers=_headers(),
+            timeout=httpx.Timeout(TIMEOUT, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY,
+                max_keepalive_connections=MAX_CONCURRENCY,
+            ),
+        )
+        _async_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _async_loop = loop
+    return _async_client, _async_semaphore
+
+async def aclose():
+    """Closes the pooled async client (call on application shutdown)."""
+    global _async_client, _async_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_loop = None
+
+async def _amake_request(endpoint: str, params: Optional[Dict] = None, method: str = 'POST') -> Optional[Dict]:
+    """
+    Async twin of _make_request over a shared keep-alive pool. Retries 429/5xx
+    and transport errors with jittered backoff; the concurrency slot is released
+    while backing off so retries never starve other requests.
+    """
+    if not API_TOKEN:
+        logging.error("INDIAN_KANOON_API_TOKEN not set in environment.")
+        return None
+    client, semaphore = _get_async_client()
+    url = f"/{endpoint}"
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                async with semaphore:
+                    if method == 'POST':
+                        response = await client.post(url, data=params)
+                    else:
+                        response = await client.get(url, params=params)
+            except httpx.TransportError as err:
+                if attempt == MAX_RETRIES:
+                    raise
+                logging.warning(f"Kanoon transport error ({err!r}), retrying")
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get('Retry-After')
+                logging.warning(f"Kanoon returned {response.status_code}, retrying")
+            await asyncio.sleep(_retry_delay(attempt, retry_after))
+    except Exception as err:
+        logging.error(f"Request Failed: {err}")
+        return None
+
+async def asearch_legal_cases(query: str, court: Optional[str] = None, max_cites: int = 5,
+                              from_date: Optional[str] = None, to_date: Optional[str] = None,
+                              pagenum: int = 0) -> Dict:
+    """Async version of search_legal_cases."""
+    params = _search_params(query, court, max_cites, from_date, to_date, pagenum)
+    return await _amake_request("search/", params=params)
+
+async def aiter_search_results(query: str, max_results: int, court: Optional[str] = None,
+                               from_date: Optional[str] = None, to_date: Optional[str] = None,
+                               page_concurrency: int = PAGE_CONCURRENCY) -> AsyncIterator[Dict]:
+    """
+    Yields up to max_results unique search hits (by tid), fetching as many
+    pages as needed. Pages are requested in parallel (at most page_concurrency
+    at a time) but yielded in page order, so relevance order is preserved.
+    Stops early at the first short or failed page; raises SearchFailed if the
+    first page itself fails.
+    """
+    if max_results <= 0:
+        return
+    # Only the pages max_results can use; duplicates are topped up below
+    pages = min(MAX_PAGES, math.ceil(max_results / PAGE_SIZE))
+    limiter = asyncio.Semaphore(page_concurrency)
+
+    async def fetch(pagenum):
+        async with limiter:
+            return await asearch_legal_cases(query, court, from_date=from_date,
+                                             to_date=to_date, pagenum=pagenum)
+
+    tasks = []
+
+    def schedule(upto):
+        for pagenum in range(len(tasks), min(upto, MAX_PAGES)):
+            tasks.append(asyncio.create_task(fetch(pagenum)))
+
+    schedule(pages)
+    sent = 0
+    seen = set()
+    try:
+        pagenum = 0
+        while pagenum < len(tasks):
+            result = await tasks[pagenum]
+            if result is None and pagenum == 0:
+                raise SearchFailed(f"Indian Kanoon search failed for '{query}'")
+            docs = (result or {}).get('docs') or []
+            for doc in docs:
+                # Pages can overlap when the index shifts between requests
+                if doc.get('tid') in seen:
+                    continue
+                seen.add(doc.get('tid'))
+                yield doc
+                sent += 1
+                if sent >= max_results:
+                    return
+            if len(docs) < PAGE_SIZE:
+                return
+            pagenum += 1
+            if pagenum == len(tasks):
+                # Duplicates left the planned pages short of max_results
+                schedule(pagenum + math.ceil((max_results - sent) / PAGE_SIZE))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def asearch_by_section(section: str, act: str) -> Dict:
+    """Async version of search_by_section."""
+    return await asearch_legal_cases(query=_section_query(section, act))
+
+async def aget_clean_verdict_text(doc_id: int) -> str:
+    """Async version of get_clean_verdict_text; disk and HTML work runs off the event loop."""
+    cached = await asyncio.to_thread(judgment_cache.get, doc_id)
+    if cached is not None:
+        return cached
+
+    data = await _amake_request(f"doc/{doc_id}/")
+    if not data or 'doc' not in data:
+        return "Error: Document content not found."
+    text = await asyncio.to_thread(extract_text, data['doc'])
+    await asyncio.to_thread(judgment_cache.put, doc_id, text)
+    return text
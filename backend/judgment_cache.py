@@ -0,0 +1,169 @@
+import os
+import tempfile
+import threading
+import zlib
+import logging
+from typing import Optional
+
+# --- CONFIGURATION ---
+CACHE_DIR = os.getenv(
+    "JUDGMENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "judgment_cache"))
+MAX_BYTES = int(float(os.getenv("JUDGMENT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+LOW_WATER = 0.9         # evict down to this fraction of MAX_BYTES
+COMPRESSION_LEVEL = 6
+
+
+class JudgmentCache:
+    """
+    Content store for cleaned judgment text, keyed by Indian Kanoon doc_id.
+
+    Each judgment is one zlib-compressed file. Writes go to a temp file in the
+    same directory and are published with os.replace, so uvicorn workers sharing
+    the directory never read a partial file. A file's mtime is its last use:
+    reads touch it, and eviction removes the least recently used files once the
+    directory grows past max_bytes. The directory's size is tracked as a running
+    total (this process's writes and removals on top of the last scan), so the
+    directory is only rescanned when that total crosses max_bytes. `version` is
+    part of every file name, so a change in the text format never serves old
+    entries.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES, version: int = 1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.bytes_saved = 0    # uncompressed bytes served from disk instead of the API
+        self._bytes: Optional[int] = None  # directory size; None until the first scan
+        self._directory_ready = False      # created on the first put, not at import
+
+    def _path(self, doc_id) -> str:
+        # Entries written in an older text format simply age out through eviction
+        return os.path.join(self.directory, f"{int(doc_id)}.v{self.version}.txt.z")
+
+    def get(self, doc_id) -> Optional[str]:
+        path = self._path(doc_id)
+        tmp_path = None
+        try:
+            with open(path, 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8')
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logging.warning(f"Dropping corrupt judgment cache entry {path}: {e}")
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(text)
+        return text
+
+    def put(self, doc_id, text: str) -> None:
+        data = zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+        path = self._path(doc_id)
+        tmp_path = None
+        try:
+            if not self._directory_ready:
+                os.makedirs(self.directory, exist_ok=True)
+                self._directory_ready = True
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not cache judgment {doc_id}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self.writes += 1
+            if self._bytes is not None:
+                self._bytes += len(data) - replaced
+            over = self._bytes is None or self._bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _remove(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            # Another worker got there first
+            return 0
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes -= size
+        return size
+
+    def _scan(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".txt.z"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass  # Nothing cached yet
+        return entries
+
+    def _evict(self) -> None:
+        """
+        Rescans the directory (picking up other workers' writes) and evicts
+        LRU entries if it is too big.
+        """
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            with self._lock:
+                self._bytes = total
+            return
+
+        target = self.max_bytes * LOW_WATER
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            total -= size
+            if self._remove(path):
+                evicted += 1
+        with self._lock:
+            self._bytes = total
+            self.evictions += evicted
+
+    def stats(self) -> dict:
+        entries = self._scan()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+            }
@@ -0,0 +1,137 @@
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from prompt_history import estimate_tokens
+from RAG_Builder.bm25_index import B, EPSILON, K1
+from RAG_Builder.fusion import reciprocal_rank_fusion
+from RAG_Builder.legal_tokenizer import tokenize
+from RAG_Builder.translation import translate_query
+
+# --- CONFIGURATION ---
+PASSAGE_TOKEN_BUDGET = int(os.getenv("JUDGMENT_PASSAGE_TOKENS", "6000"))  # per read_full_judgment call
+OPERATIVE_PARAGRAPHS = 3      # closing paragraphs (the operative order) always included
+MAX_PASSAGE_CHARS = 2000      # longer paragraphs are split so one cannot eat the budget
+VECTOR_CACHE_DOCS = int(os.getenv("JUDGMENT_VECTOR_CACHE_DOCS", "64"))
+
+# The user's question for the agent run in progress (as typed, possibly Hindi);
+# tools rank passages against its English form
+active_query: contextvars.ContextVar[str] = contextvars.ContextVar("active_query", default="")
+
+
+def split_passages(text: str) -> List[str]:
+    """Paragraphs of a cleaned judgment (blank-line separated), long ones split at sentence ends."""
+    passages = []
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        while len(paragraph) > MAX_PASSAGE_CHARS:
+            cut = paragraph.rfind(". ", 0, MAX_PASSAGE_CHARS)
+            cut = cut + 1 if cut > MAX_PASSAGE_CHARS // 2 else MAX_PASSAGE_CHARS
+            passages.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            passages.append(paragraph)
+    return passages
+
+
+class PassageVectorCache:
+    """Embeddings of each judgment's passages, LRU by doc_id, so re-reads only embed the query."""
+
+    def __init__(self, max_docs: int = VECTOR_CACHE_DOCS):
+        self.max_docs = max_docs
+        self._vectors: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, doc_id: int, passages: List[str], embeddings) -> np.ndarray:
+        with self._lock:
+            vectors = self._vectors.get(doc_id)
+            if vectors is not None and len(vectors) == len(passages):
+                self._vectors.move_to_end(doc_id)
+                self.hits += 1
+                return vectors
+            self.misses += 1
+
+        vectors = np.asarray(embeddings.embed_documents(passages), dtype=np.float32)
+        with self._lock:
+            self._vectors[doc_id] = vectors
+            self._vectors.move_to_end(doc_id)
+            while len(self._vectors) > self.max_docs:
+                self._vectors.popitem(last=False)
+        return vectors
+
+    def stats(self):
+        with self._lock:
+            return {"docs": len(self._vectors), "hits": self.hits, "misses": self.misses}
+
+
+passage_vectors = PassageVectorCache()
+
+
+def rank_passages(passages: List[str], query: str, doc_id: Optional[int] = None, embeddings=None) -> List[int]:
+    """
+    Passage indices, most relevant first: BM25 (legal tokenizer) and, when an
+    embedding model is given, cosine similarity, fused with RRF.
+    """
+    ranked_lists = []
+    query_tokens = tokenize(query)
+    if query_tokens:
+        # bm25_index.py is a persisted index over the statute corpus; one
+        # judgment's few hundred passages are scored in memory and thrown away,
+        # with the same tokenizer and Okapi parameters
+        bm25 = BM25Okapi([tokenize(p) or [""] for p in passages], k1=K1, b=B, epsilon=EPSILON)
+        scores = bm25.get_scores(query_tokens)
+        ranked_lists.append([int(i) for i in np.argsort(-scores, kind="stable") if scores[i] > 0])
+
+    if embeddings is not None:
+        vectors = passage_vectors.get(doc_id, passages, embeddings) if doc_id is not None \
+            else np.asarray(embeddings.embed_documents(passages), dtype=np.float32)
+        query_vec = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        similarities = vectors @ query_vec
+        ranked_lists.append([int(i) for i in np.argsort(-similarities, kind="stable")])
+
+    return [i for i, _ in reciprocal_rank_fusion(ranked_lists)]
+
+
+def select_passages(text: str, query: str, doc_id: Optional[int] = None, embeddings=None,
+                    budget: int = PASSAGE_TOKEN_BUDGET) -> str:
+    """
+    The judgment cut down to `budget` tokens: the closing (operative) paragraphs,
+    then the passages most relevant to `query`, printed in document order with
+    their paragraph numbers. Judgments that fit the budget are returned whole.
+    A Hindi query is translated first, since judgments are in English.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    query = translate_query(query) if query.strip() else query
+
+    passages = split_passages(text)
+    chosen = set(range(max(0, len(passages) - OPERATIVE_PARAGRAPHS), len(passages)))
+    used = sum(estimate_tokens(passages[i]) for i in chosen)
+
+    order = rank_passages(passages, query, doc_id, embeddings) if query.strip() else []
+    # Without a query (or any match), fall back to the opening paragraphs
+    for i in order + list(range(len(passages))):
+        if used >= budget:
+            break
+        cost = estimate_tokens(passages[i])
+        if i not in chosen and used + cost <= budget:
+            chosen.add(i)
+            used += cost
+
+    lines = [f"[Showing {len(chosen)} of {len(passages)} paragraphs"
+             + (f" most relevant to: {query.strip()}" if query.strip() else "")
+             + "; the final paragraphs hold the operative order.]"]
+    previous = -1
+    for i in sorted(chosen):
+        if i != previous + 1:
+            lines.append("[...]")
+        lines.append(f"[¶{i + 1}] {passages[i]}")
+        previous = i
+    return "\n\n".join(lines)
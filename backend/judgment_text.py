@@ -0,0 +1,84 @@
+import re
+from html import unescape
+from typing import Iterator
+
+# --- CONFIGURATION ---
+# Bump when the extracted text changes shape, so cached text is not reused
+FORMAT_VERSION = 2
+
+# Tags that end one paragraph and start the next
+BLOCK_TAGS = (
+    "p", "div", "pre", "blockquote", "br", "li", "ul", "ol", "tr", "table",
+    "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "title", "hr",
+)
+SKIP_TAGS = ("script", "style", "noscript")
+
+# The scan only stops at block boundaries and skipped blocks; inline markup
+# between them is removed in bulk, so Python work is per paragraph, not per tag.
+_BOUNDARY_RE = re.compile(
+    r"<(" + "|".join(SKIP_TAGS) + r")\b.*?</\1\s*>"
+    r"|<!--.*?-->"
+    r"|<(/?)(" + "|".join(BLOCK_TAGS) + r")\b[^>]*>",
+    re.S | re.I,
+)
+_INLINE_TAG_RE = re.compile(r"<[^>]*>")
+
+# A paragraph that is only a marker ("12.", "(iv)", "3)") is joined to the next one
+_MARKER_RE = re.compile(r"^(?:\d{1,3}[.)]|\((?:\d{1,3}|[a-z]{1,4})\))$", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+class _Paragraphs:
+    """Turns raw segments into clean paragraphs, joining marker-only ones to the next."""
+
+    def __init__(self):
+        self.marker = ""
+
+    def clean(self, segment):
+        text = _SPACE_RE.sub(" ", unescape(_INLINE_TAG_RE.sub("", segment))).strip()
+        if not text:
+            return None
+        if self.marker:
+            text = f"{self.marker} {text}"
+            self.marker = ""
+        if _MARKER_RE.match(text):
+            self.marker = text
+            return None
+        return text
+
+
+def iter_paragraphs(html: str) -> Iterator[str]:
+    """
+    Scans a judgment's HTML in one pass and yields its paragraphs as they
+    complete. Inline markup (<b>, <a>, <span>) stays inside the paragraph,
+    scripts, styles and comments are dropped, and numbered markers such as
+    "12." stay at the start of their paragraph. Line breaks inside <pre> are
+    paragraph breaks, as Kanoon uses <pre> for older judgments.
+    """
+    paragraphs = _Paragraphs()
+    in_pre = 0
+    position = 0
+
+    for match in _BOUNDARY_RE.finditer(html):
+        segment = html[position:match.start()]
+        position = match.end()
+        for line in (segment.split("\n") if in_pre else (segment,)):
+            text = paragraphs.clean(line)
+            if text:
+                yield text
+
+        closing, tag = match.group(2, 3)
+        if tag and tag.lower() == "pre":
+            in_pre = max(0, in_pre - 1) if closing else in_pre + 1
+
+    for line in (html[position:].split("\n") if in_pre else (html[position:],)):
+        text = paragraphs.clean(line)
+        if text:
+            yield text
+    if paragraphs.marker:
+        yield paragraphs.marker
+
+
+def extract_text(html: str) -> str:
+    """Clean judgment text with one blank line between paragraphs."""
+    return "\n\n".join(iter_paragraphs(html))
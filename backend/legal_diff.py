@@ -0,0 +1,174 @@
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List
+
+# --- CONFIGURATION ---
+MAX_EDITS = 20          # edits of each kind listed per pair
+MAX_CHANGES = 8         # human-readable lines in analysis.changes
+MAX_PHRASE_WORDS = 12   # longer edits are shortened in the change list
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# Clause boundaries: sub-section/clause markers, semicolons and full stops
+_CLAUSE_RE = re.compile(r"(?:^|\s)(?=\((?:\d{1,3}|[a-z]{1,4})\)\s)|(?<=[;.])\s+")
+_SPACE_RE = re.compile(r"\s+")
+# "(1) " in front of a sliced sub-section is not part of its wording
+_LEADING_MARKER_RE = re.compile(r"^\((?:\d{1,3}|[a-z]{1,4})\)\s*")
+
+
+def clean_text(text: str) -> str:
+    """Repairs UTF-8 read as Latin-1 ("â\x80\x9c" -> "“") and collapses whitespace."""
+    if "â" in text:
+        try:
+            text = text.encode("latin-1").decode("utf-8")
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _phrase(tokens: List[str]) -> str:
+    text = " ".join(tokens)
+    text = re.sub(r"\s+([,.;:)\]])", r"\1", text)
+    return re.sub(r"([(\[])\s+", r"\1", text)
+
+
+def _short(tokens: List[str]) -> str:
+    if len(tokens) <= MAX_PHRASE_WORDS:
+        return _phrase(tokens)
+    return _phrase(tokens[:MAX_PHRASE_WORDS]) + " …"
+
+
+def _clauses(text: str) -> List[str]:
+    return [c.strip().lower() for c in _CLAUSE_RE.split(text) if c and c.strip()]
+
+
+def _diff(old: str, new: str):
+    """Returns (diff_texts result, raw token edits)."""
+    old_tokens, new_tokens = _TOKEN_RE.findall(old), _TOKEN_RE.findall(new)
+    matcher = SequenceMatcher(None, [t.lower() for t in old_tokens],
+                              [t.lower() for t in new_tokens], autojunk=False)
+
+    insertions, deletions, substitutions = [], [], []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "insert":
+            insertions.append(new_tokens[j1:j2])
+        elif op == "delete":
+            deletions.append(old_tokens[i1:i2])
+        elif op == "replace":
+            substitutions.append((old_tokens[i1:i2], new_tokens[j1:j2]))
+
+    clause_matcher = SequenceMatcher(None, _clauses(old), _clauses(new), autojunk=False)
+    clauses = {"unchanged": 0, "modified": 0, "added": 0, "removed": 0}
+    for op, i1, i2, j1, j2 in clause_matcher.get_opcodes():
+        if op == "equal":
+            clauses["unchanged"] += i2 - i1
+        elif op == "insert":
+            clauses["added"] += j2 - j1
+        elif op == "delete":
+            clauses["removed"] += i2 - i1
+        else:
+            paired = min(i2 - i1, j2 - j1)
+            clauses["modified"] += paired
+            clauses["removed"] += (i2 - i1) - paired
+            clauses["added"] += (j2 - j1) - paired
+
+    return {
+        "similarity": round(matcher.ratio(), 4),
+        "insertions": [_phrase(t) for t in insertions[:MAX_EDITS]],
+        "deletions": [_phrase(t) for t in deletions[:MAX_EDITS]],
+        "substitutions": [{"from": _phrase(a), "to": _phrase(b)} for a, b in substitutions[:MAX_EDITS]],
+        "clauses": clauses,
+    }, (insertions, deletions, substitutions)
+
+
+def diff_texts(old: str, new: str) -> Dict:
+    """
+    Word- and clause-level diff of two statute texts (old law -> new law).
+    Returns insertions, deletions and substitutions as phrases, a word-level
+    similarity in [0, 1] and clause counts (unchanged/modified/added/removed).
+    Case-insensitive, punctuation kept as separate tokens.
+    """
+    return _diff(old, new)[0]
+
+
+def _change_lines(edits, label: str) -> List[str]:
+    insertions, deletions, substitutions = edits
+    # Largest edits first: they are the ones a reader cares about
+    lines = [(len(a) + len(b), f'{label}: "{_short(a)}" → "{_short(b)}"') for a, b in substitutions]
+    lines += [(len(t), f'{label}: added "{_short(t)}"') for t in insertions]
+    lines += [(len(t), f'{label}: removed "{_short(t)}"') for t in deletions]
+    return [line for _, line in sorted(lines, key=lambda e: -e[0])]
+
+
+def compare_local(p_label: str, p_text: str, s_label: str, s_nodes: List[Dict], mode: str) -> Dict:
+    """
+    Deterministic, LLM-free comparison with the same primary/related/analysis
+    shape as LegalBackend._call_groq. The diff always runs old -> new: IPC to
+    BNS, whichever side the user asked about.
+
+    A node with "aligned_text" is diffed against that part of the primary
+    (its clauses) instead of the whole primary text; when it is None the
+    clauses could not be located, and the node gets no diff (similarity None).
+    """
+    primary = clean_text(p_text)
+    related, changes, summaries, unaligned = [], [], [], []
+
+    for node in s_nodes:
+        text = clean_text(node["text"])
+        node_label = f"{s_label} {node['id']}"
+        own = node.get("aligned_text", p_text)
+        if own is None:
+            unaligned.append(node_label)
+            related.append({"id": node["id"], "heading": node.get("heading", ""), "text_clean": text,
+                            "similarity": None})
+            continue
+        own = clean_text(own)
+        old, new = (own, text) if mode == "IPC_TO_BNS" else (text, own)
+        diff, edits = _diff(_LEADING_MARKER_RE.sub("", old), _LEADING_MARKER_RE.sub("", new))
+        changes += _change_lines(edits, node_label)
+        summaries.append(f"{node_label} {diff['similarity']:.0%} similar")
+        related.append({"id": node["id"], "heading": node.get("heading", ""), "text_clean": text, **diff})
+
+    if not related:
+        summary = f"No related {s_label} provision found for {p_label}."
+    elif not summaries:
+        summary = f"No clause of {p_label} could be aligned with {', '.join(unaligned)}; no word-level diff."
+    else:
+        summary = f"{p_label} compared word by word: " + ", ".join(summaries) + "."
+        if unaligned:
+            summary += f" Not aligned: {', '.join(unaligned)}."
+
+    return {
+        "mode": "local",
+        "primary": {"id": p_label, "text_clean": primary},
+        "related": related,
+        "analysis": {
+            "summary": summary,
+            "changes": changes[:MAX_CHANGES] or ([] if not summaries and related else ["No textual changes."]),
+            "similarity": max((r["similarity"] for r in related if r["similarity"] is not None),
+                              default=None if related else 0.0),
+        },
+    }
+
+
+def compare_official(p_label: str, p_text: str, s_label: str, s_nodes: List[Dict], mode: str,
+                     primary_summary: str = None) -> Dict:
+    """
+    The official "Summary of comparison" (government correspondence table)
+    as the analysis, over the local diff for cleaned text and per-node
+    detail. Nodes the table does not cover fall back to their diff lines.
+    """
+    result = compare_local(p_label, p_text, s_label, s_nodes, mode)
+    changes = []
+    for node, related in zip(s_nodes, result["related"]):
+        related["official_summary"] = node.get("summary")
+        if node.get("summary"):
+            changes.append(f"{s_label} {node['id']}: {node['summary']}")
+
+    summaries = [n["summary"] for n in s_nodes if n.get("summary")]
+    result["mode"] = "official"
+    result["analysis"]["summary"] = primary_summary or summaries[0]
+    result["analysis"]["changes"] = (
+        changes + [line for line in result["analysis"]["changes"]
+                   if not any(line.startswith(f"{s_label} {n['id']}:") for n in s_nodes if n.get("summary"))]
+    )[:MAX_CHANGES]
+    return result
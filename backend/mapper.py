@@ -1,123 +1,272 @@
 import os
 import json
 import re
+import hashlib
+import pickle
+import sys
+import tempfile
 from groq import Groq
 from dotenv import load_dotenv
+from compare_cache import SECTION_RE, CompareKey
+from section_tree import SectionIndex
+from legal_diff import compare_local, compare_official
+from prompt_history import estimate_tokens
+from rate_limiter import INTERACTIVE, MAX_WAIT, get_bucket, is_rate_limit_error
+from RAG_Builder.ingest_summaries import section_key, split_sections
 
 # --- CONFIG ---
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_MODEL = "llama-3.3-70b-versatile"
+GROQ_MAX_COMPLETION_TOKENS = 1500  # reserved from the token bucket per comparison, corrected after the call
+PROMPT_VERSION = "1"  # Bump whenever the _call_groq prompt changes (invalidates cached comparisons)
+SOURCE_FILES = ['ipc_data.json', 'bns_data.json', 'ipc_bns_mappings.json', 'ipc_bns_summaries.json']
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_PATH = os.getenv("LEGAL_SNAPSHOT_PATH", os.path.join(DATA_DIR, "legal_index.pkl"))
+# "require": load the prebuilt snapshot and fail if it is missing or stale, so a bad deploy is loud
+# "auto": (re)build and write the snapshot when it is missing or stale (development)
+# "off": rebuild the indices from the JSON sources on every start
+SNAPSHOT_MODE = os.getenv("LEGAL_SNAPSHOT", "require")
+SNAPSHOT_FORMAT = 3  # Bump whenever the shape of build_indices() changes
+
+
+class SnapshotError(RuntimeError):
+    """The index snapshot is missing, unreadable or out of date with its sources."""
+
+
+def _get_parent_id(section_id):
+    # "2(1)" -> "2", "302" -> "302"
+    return re.split(r'[\(\s]', str(section_id).strip())[0]
+
+def _load_json(name):
+    path = os.path.join(DATA_DIR, name)
+    try:
+        with open(path, 'r', encoding='utf-8') as file: return json.load(file)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"❌ Could not load legal data file {path}: {e}") from e
+
+def source_stats(files=SOURCE_FILES):
+    """(mtime_ns, size) of every source file, keyed by file name."""
+    stats = {}
+    for name in files:
+        st = os.stat(os.path.join(DATA_DIR, name))
+        stats[name] = [st.st_mtime_ns, st.st_size]
+    return stats
+
+def source_hashes(files=SOURCE_FILES):
+    """sha256 of every source file, keyed by file name."""
+    hashes = {}
+    for name in files:
+        with open(os.path.join(DATA_DIR, name), 'rb') as file:
+            hashes[name] = hashlib.sha256(file.read()).hexdigest()
+    return hashes
+
+def build_indices():
+    """Parses the JSON sources into every lookup structure LegalBackend needs."""
+    # Stat before reading, so an edit made during the build leaves the snapshot stale
+    stats = source_stats()
+    ipc_db = _load_json('ipc_data.json')
+    bns_db = _load_json('bns_data.json')
+    mappings = _load_json('ipc_bns_mappings.json')
+    hashes = source_hashes()
+
+    # Official "Summary of comparison" per BNS/IPC pair (RAG_Builder/ingest_summaries.py);
+    # rows without an IPC section (new or consolidated provisions) describe the BNS side alone
+    official = {}
+    bns_summaries = {}
+    for row in _load_json('ipc_bns_summaries.json'):
+        if not row['Summary']:
+            continue
+        official[(row['BNS_Section'], row['IPC_Section'])] = row['Summary']
+        # "228A" in the mappings finds the summary the table gives for "228A(1)"
+        official.setdefault((row['BNS_Section'], _get_parent_id(row['IPC_Section'])), row['Summary'])
+        if row['IPC_Section'] in ('', 'New', '-'):
+            bns_summaries[row['BNS_Section']] = row['Summary']
+
+    # 1. Index Databases (Key = Parent Section ID)
+    ipc_lookup = {str(i.get('Section', '')).strip(): i for i in ipc_db}
+    bns_lookup = {str(i.get('Section', '')).strip(): i for i in bns_db}
+
+    # 2. Build Indices
+    ipc_to_bns = {}
+    bns_to_ipc = {}
+
+    for m in mappings:
+        ipc_raw = str(m.get('IPC_Section', '')).strip()
+        bns_raw = str(m.get('BNS_Section', '')).strip()
+        heading = m.get('Heading', '')
+        bns_key = section_key(bns_raw)
+        summary = next((official[(bns_key, k)] for k in split_sections(ipc_raw) if (bns_key, k) in official), None)
+
+        if not ipc_raw or ipc_raw.lower() == 'new': continue
+
+        # Index IPC -> BNS
+        if ipc_raw not in ipc_to_bns: ipc_to_bns[ipc_raw] = []
+        ipc_to_bns[ipc_raw].append({
+            "target": bns_raw,
+            "heading": heading,
+            "summary": summary
+        })
+
+        # Index BNS -> IPC (Key is Parent BNS ID, e.g., "2" for "2(1)")
+        bns_parent = _get_parent_id(bns_raw)
+        if bns_parent not in bns_to_ipc: bns_to_ipc[bns_parent] = []
+        bns_to_ipc[bns_parent].append({
+            "source": ipc_raw,
+            "heading": heading,
+            "specific_clause": bns_raw,
+            "summary": summary
+        })
+
+    return {
+        "source_stats": stats,
+        "source_hashes": hashes,
+        # Short hash of the statute corpora; any edit to them changes every cache key
+        "corpus_version": hashlib.sha256("".join(hashes[f] for f in SOURCE_FILES).encode()).hexdigest()[:16],
+        "ipc_lookup": ipc_lookup,
+        "bns_lookup": bns_lookup,
+        "ipc_to_bns": ipc_to_bns,
+        "bns_to_ipc": bns_to_ipc,
+        "bns_summaries": bns_summaries,
+        # Subsection/clause trees, parsed once: O(1) text for "2(1)" or "64(2)(a)"
+        "ipc_tree": SectionIndex(ipc_db),
+        "bns_tree": SectionIndex(bns_db),
+    }
+
+def build_snapshot(path=SNAPSHOT_PATH):
+    """Builds the indices and writes them atomically as one pickle file."""
+    return write_snapshot(build_indices(), path)
+
+def write_snapshot(indices, path=SNAPSHOT_PATH):
+    payload = pickle.dumps({"format": SNAPSHOT_FORMAT, "indices": indices}, protocol=pickle.HIGHEST_PROTOCOL)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return indices
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Loads the snapshot with a single read; raises SnapshotError if it is missing or stale."""
+    hint = "Build it with: python mapper.py --build-snapshot (or set LEGAL_SNAPSHOT=auto in development)"
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.loads(f.read())
+    except FileNotFoundError:
+        raise SnapshotError(f"❌ Legal index snapshot not found at {path}. {hint}") from None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        raise SnapshotError(f"❌ Legal index snapshot {path} is unreadable ({e}). {hint}") from e
+
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"❌ Legal index snapshot {path} has format {snapshot.get('format')}, "
+                            f"expected {SNAPSHOT_FORMAT}. {hint}")
+    indices = snapshot["indices"]
+    # Only files whose mtime or size moved are re-hashed, so a fresh snapshot costs a few stat() calls
+    stats = source_stats()
+    touched = [name for name in SOURCE_FILES if indices["source_stats"].get(name) != stats[name]]
+    changed = [name for name, digest in source_hashes(touched).items()
+               if indices["source_hashes"].get(name) != digest]
+    if changed:
+        raise SnapshotError(f"❌ Legal index snapshot {path} is stale: {', '.join(changed)} changed. {hint}")
+    return indices
+
+
+def load_or_build_snapshot(path=SNAPSHOT_PATH):
+    """The snapshot's indices, rebuilding (and rewriting) the snapshot if it is missing or stale."""
+    try:
+        return load_snapshot(path)
+    except SnapshotError as e:
+        print(f"{e}\n🔨 Rebuilding it...")
+    indices = build_indices()
+    try:
+        write_snapshot(indices, path)
+        print(f"✅ Snapshot for corpus {indices['corpus_version']} written to {path}")
+    except OSError as e:
+        # Read-only deployments still start, just without the fast path next time
+        print(f"⚠️ Could not write the legal index snapshot to {path}: {e}")
+    return indices
+
 
 class LegalBackend:
-    def __init__(self):
+    def __init__(self, snapshot_mode=SNAPSHOT_MODE):
         if not GROQ_API_KEY:
             raise ValueError("❌ GROQ_API_KEY not found! Set env variable.")
             
         self.client = Groq(api_key=GROQ_API_KEY)
-        
-        self.ipc_db = self._load_json('ipc_data.json')
-        self.bns_db = self._load_json('bns_data.json')
-        self.mappings = self._load_json('ipc_bns_mappings.json')
-        
-        # 1. Index Databases (Key = Parent Section ID)
-        self.ipc_lookup = {str(i.get('Section', '')).strip(): i for i in self.ipc_db}
-        self.bns_lookup = {str(i.get('Section', '')).strip(): i for i in self.bns_db}
-        
-        # 2. Build Indices
-        self.ipc_to_bns = {}
-        self.bns_to_ipc = {}
-        
-        for m in self.mappings:
-            ipc_raw = str(m.get('IPC_Section', '')).strip()
-            bns_raw = str(m.get('BNS_Section', '')).strip()
-            heading = m.get('Heading', '')
-            
-            if not ipc_raw or ipc_raw.lower() == 'new': continue
-            
-            # Index IPC -> BNS
-            if ipc_raw not in self.ipc_to_bns: self.ipc_to_bns[ipc_raw] = []
-            self.ipc_to_bns[ipc_raw].append({
-                "target": bns_raw,
-                "heading": heading
-            })
-            
-            # Index BNS -> IPC (Key is Parent BNS ID, e.g., "2" for "2(1)")
-            bns_parent = self._get_parent_id(bns_raw)
-            if bns_parent not in self.bns_to_ipc: self.bns_to_ipc[bns_parent] = []
-            self.bns_to_ipc[bns_parent].append({
-                "source": ipc_raw,
-                "heading": heading,
-                "specific_clause": bns_raw
-            })
-            
+        # Shared Groq quota; batch jobs lower the priority and wait longer
+        self.limiter = get_bucket("groq", GROQ_MODEL)
+        self.llm_priority = INTERACTIVE
+        self.llm_max_wait = MAX_WAIT
 
-    def _load_json(self, f):
-        try:
-            with open(f, 'r', encoding='utf-8') as file: return json.load(file)
-        except: return []
+        if snapshot_mode == "off":
+            indices = build_indices()
+        elif snapshot_mode == "auto":
+            indices = load_or_build_snapshot()
+        else:
+            indices = load_snapshot()
+        self.corpus_version = indices["corpus_version"]
+        self.ipc_lookup = indices["ipc_lookup"]
+        self.bns_lookup = indices["bns_lookup"]
+        self.ipc_to_bns = indices["ipc_to_bns"]
+        self.bns_to_ipc = indices["bns_to_ipc"]
+        self.bns_summaries = indices["bns_summaries"]
+        self.ipc_tree = indices["ipc_tree"]
+        self.bns_tree = indices["bns_tree"]
 
-    def _get_parent_id(self, section_id):
-        # "2(1)" -> "2", "302" -> "302"
-        return re.split(r'[\(\s]', str(section_id).strip())[0]
+    def compare_key(self, law, section_id):
+        """Cache key for a /compare answer (see compare_cache.CompareKey)."""
+        return CompareKey(law, section_id, self.corpus_version, GROQ_MODEL, PROMPT_VERSION)
 
-    def _extract_subsection_text(self, full_text, sub_id):
+    def _fetch_section_text(self, tree, section_id):
         """
-        THE MAGIC: Extracts "(1) ... " until the next "(2)"
+        Text of "2(1)", "64(2)(a)" etc. from the precomputed subsection tree.
+        Falls back to the whole parent section when the clause is not marked
+        up in the source text, and to "" when the section is unknown.
         """
-        if not sub_id or not full_text: return full_text
-        
-        # Regex: Look for "(sub_id)" ... lazy match until next "(digit)" or end
-        # We handle variations like "(1)" or "1." if needed, but BNS uses "(1)"
-        pattern = r'\(' + re.escape(sub_id) + r'\)(.*?)(?=\(\d+\)|$)'
-        match = re.search(pattern, full_text, re.DOTALL)
-        
-        if match:
-            # Return just the relevant snippet
-            return f"({sub_id}) {match.group(1).strip()}"
-        return full_text # Fallback: return everything if regex fails
+        text = tree.get(section_id)
+        if text is None:
+            text = tree.get(_get_parent_id(section_id)) or ""
+        return text
 
     def _smart_fetch_bns(self, bns_full_id):
         """
         Input: "2(1)"
         Output: Just the text for definition of "Act", not the whole dictionary.
         """
-        parent_id = self._get_parent_id(bns_full_id)
-        
-        # 1. Fetch Parent Node
-        if parent_id not in self.bns_lookup:
-            return "Text not found in DB."
-            
-        full_text = self.bns_lookup[parent_id].get('section_desc', '')
-        
-        # 2. Check for Subsection Request
-        # Parses "2(1)" to extract sub_id="1"
-        match = re.match(r"\d+\s*\((.*?)\)", bns_full_id)
-        if match:
-            sub_id = match.group(1)
-            # 3. Extract Specific Text
-            return self._extract_subsection_text(full_text, sub_id)
-        
-        return full_text
+        return self._fetch_section_text(self.bns_tree, bns_full_id) or "Text not found in DB."
 
-    def process_query(self, user_query):
+    def process_query(self, user_query, mode="llm"):
+        """
+        mode="llm" asks Groq for a cleaned, summarised comparison;
+        mode="local" returns a deterministic word/clause diff (no LLM call);
+        mode="official" returns the government correspondence table's summary
+        on top of the local diff; mode="auto" is "official" where the table
+        covers the section and "llm" otherwise. mode="estimate" makes no call
+        and returns the Groq tokens the "llm" mode would reserve.
+        """
         clean_query = user_query.upper().strip()
-        match = re.search(r'\d+(\(\w+\))*', clean_query) # Matches 2 or 2(1)
+        match = SECTION_RE.search(clean_query) # Matches 2, 2(1) or 498A
         if not match: return {"error": "No section number found."}
         section_id = match.group(0)
         
         if "BNS" in clean_query:
-            return self._handle_bns_query(section_id)
+            return self._handle_bns_query(section_id, mode)
         else:
-            return self._handle_ipc_query(section_id)
+            return self._handle_ipc_query(section_id, mode)
 
     # ---------------------------------------------------------
     # IPC QUERY (Forward)
     # ---------------------------------------------------------
-    def _handle_ipc_query(self, ipc_id):
+    def _handle_ipc_query(self, ipc_id, mode="llm"):
         if ipc_id not in self.ipc_to_bns:
             return {"error": f"No mapping for IPC {ipc_id}"}
 
-        ipc_text = self.ipc_lookup.get(ipc_id, {}).get('section_desc', '')
+        ipc_text = self._fetch_section_text(self.ipc_tree, ipc_id)
         
         secondary_nodes = []
         for target in self.ipc_to_bns[ipc_id]:
@@ -129,17 +278,18 @@ class LegalBackend:
             secondary_nodes.append({
                 "id": bns_target_id,
                 "heading": target['heading'],
-                "text": bns_text
+                "text": bns_text,
+                "summary": target['summary']
             })
             
-        return self._call_groq(f"IPC {ipc_id}", ipc_text, "BNS", secondary_nodes, "IPC_TO_BNS")
+        return self._compare(f"IPC {ipc_id}", ipc_text, "BNS", secondary_nodes, "IPC_TO_BNS", mode)
 
     # ---------------------------------------------------------
     # BNS QUERY (Reverse)
     # ---------------------------------------------------------
-    def _handle_bns_query(self, bns_id):
+    def _handle_bns_query(self, bns_id, mode="llm"):
         # Even if user asks "BNS 2(1)", we look up mapping via Parent "2"
-        parent_id = self._get_parent_id(bns_id)
+        parent_id = _get_parent_id(bns_id)
         
         if parent_id not in self.bns_to_ipc:
             return {"error": f"No mapping for BNS {bns_id}"}
@@ -148,7 +298,7 @@ class LegalBackend:
         bns_text = self._smart_fetch_bns(bns_id)
         
         secondary_nodes = []
-        seen = set()
+        clauses = {}
         for source in self.bns_to_ipc[parent_id]:
             # Filter: If user specifically asked "2(1)", only show IPCs mapped to "2(1)"
             # If user asked "2", show everything.
@@ -156,22 +306,51 @@ class LegalBackend:
                 continue
 
             ipc_id = source['source']
-            if ipc_id in seen: continue
-            seen.add(ipc_id)
-            
-            ipc_text = self.ipc_lookup.get(ipc_id, {}).get('section_desc', '')
-            secondary_nodes.append({
-                "id": ipc_id,
-                "heading": source['heading'],
-                "text": ipc_text
-            })
-            
-        return self._call_groq(f"BNS {bns_id}", bns_text, "IPC", secondary_nodes, "BNS_TO_IPC")
+            if ipc_id not in clauses:
+                clauses[ipc_id] = []
+                ipc_text = self._fetch_section_text(self.ipc_tree, ipc_id)
+                secondary_nodes.append({
+                    "id": ipc_id,
+                    "heading": source['heading'],
+                    "text": ipc_text,
+                    "summary": source['summary']
+                })
+            clauses[ipc_id].append(source['specific_clause'])
+
+        # Asked for a whole section whose clauses map to different IPC sections
+        # (e.g. BNS 2): each IPC section is diffed against its own clauses only
+        for node in secondary_nodes:
+            node_clauses = list(dict.fromkeys(clauses[node["id"]]))
+            if all("(" in c and c != bns_id for c in node_clauses):
+                texts = [self.bns_tree.get(c) for c in node_clauses]
+                node["aligned_text"] = "\n".join(texts) if all(texts) else None
+
+        return self._compare(f"BNS {bns_id}", bns_text, "IPC", secondary_nodes, "BNS_TO_IPC", mode,
+                             primary_summary=self.bns_summaries.get(section_key(bns_id)))
+
+    def _compare(self, p_label, p_text, s_label, s_nodes, direction, mode, primary_summary=None):
+        has_official = bool(primary_summary) or any(n['summary'] for n in s_nodes)
+        if mode == "auto":
+            mode = "official" if has_official else "llm"
+
+        if mode == "local":
+            return compare_local(p_label, p_text, s_label, s_nodes, direction)
+        if mode == "official":
+            if not has_official:
+                return {"error": f"No official comparison summary for {p_label}", "official_missing": True}
+            return compare_official(p_label, p_text, s_label, s_nodes, direction, primary_summary)
+        if mode == "estimate":
+            return {"tokens": self._groq_estimate(self._groq_prompt(p_label, p_text, s_label, s_nodes))}
+        return self._call_groq(p_label, p_text, s_label, s_nodes, direction)
+
+    def llm_token_estimate(self, user_query):
+        """Tokens the LLM comparison for user_query reserves, for waiting on quota before running it."""
+        return self.process_query(user_query, mode="estimate").get("tokens", 0)
 
     # ---------------------------------------------------------
     # GROQ ANALYST
     # ---------------------------------------------------------
-    def _call_groq(self, p_label, p_text, s_label, s_nodes, mode):
+    def _groq_prompt(self, p_label, p_text, s_label, s_nodes):
         nodes_block = "\n".join([f"--- {s_label} {n['id']} ---\nTEXT: {n['text'][:1500]}" for n in s_nodes])
         
         prompt = f"""
@@ -194,16 +373,39 @@ class LegalBackend:
             }}
         }}
         """
+        return prompt
+
+    def _groq_estimate(self, prompt):
+        return estimate_tokens(prompt) + GROQ_MAX_COMPLETION_TOKENS
+
+    def _call_groq(self, p_label, p_text, s_label, s_nodes, mode):
+        prompt = self._groq_prompt(p_label, p_text, s_label, s_nodes)
+        estimate = self._groq_estimate(prompt)
         try:
+            self.limiter.acquire_sync(estimate, self.llm_priority, max_wait=self.llm_max_wait)
             res = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+                model=GROQ_MODEL,
                 messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                # Caps the completion at what the bucket reserved for it
+                max_tokens=GROQ_MAX_COMPLETION_TOKENS,
             )
+            if res.usage:
+                self.limiter.debit(res.usage.total_tokens - estimate)
             return json.loads(res.choices[0].message.content)
-        except Exception as e: return {"error": str(e)}
+        except Exception as e:
+            if is_rate_limit_error(e):
+                limited = self.limiter.penalize(e)
+                return {"error": str(limited), "retry_after": limited.retry_after}
+            return {"error": str(e)}
 
 if __name__ == "__main__":
+    if "--build-snapshot" in sys.argv:
+        print("🔨 Building legal index snapshot...")
+        built = build_snapshot()
+        print(f"✅ Snapshot for corpus {built['corpus_version']} written to {SNAPSHOT_PATH}")
+        sys.exit(0)
+
     be = LegalBackend()
     # Test Smart Extraction: Should return just the "Act" definition, not "Animal"/"Court"
     print(be.process_query("BNS 2(1)"))
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+ONNX Runtime embeddings for CPU, as a drop-in LangChain Embeddings.
+
+A sentence-transformers model is exported once to ONNX (optionally with int8
+dynamic quantization) into ONNX_CACHE_DIR, together with its tokenizer and
+pooling settings. At runtime only onnxruntime and tokenizers are needed:
+texts are tokenized in batches (sorted by length to cut padding), run through
+the graph with a fixed intra-op thread count, then pooled (CLS or mean, as the
+model's 1_Pooling config says) and L2-normalised.
+
+EMBEDDING_BACKEND=onnx selects it wherever make_embeddings() is used; the
+default "torch" keeps HuggingFaceEmbeddings.
+
+Usage (from backend/):
+    python onnx_embeddings.py --export BAAI/bge-small-en-v1.5          # int8
+    python onnx_embeddings.py --export BAAI/bge-small-en-v1.5 --fp32
+Exporting needs torch and transformers (installed with sentence-transformers)
+and, for quantization, the onnx package.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# --- CONFIGURATION ---
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" or "onnx"
+ONNX_CACHE_DIR = os.getenv(
+    "EMBEDDING_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models"))
+ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "1") == "1"
+# Intra-op threads per session; more than the physical cores only adds contention
+ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", str(min(4, os.cpu_count() or 1))))
+BATCH_SIZE = 32
+OPSET = 17
+CONFIG_NAME = "embedding_config.json"
+
+
+def _resolve_model_dir(model_name: str) -> str:
+    """A local model directory, or the Hugging Face cache snapshot of a hub id."""
+    if os.path.isdir(model_name):
+        return model_name
+    from huggingface_hub import snapshot_download
+    return snapshot_download(model_name)
+
+
+def _read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def pooling_config(model_dir: str) -> dict:
+    """Pooling, normalisation and max length as sentence-transformers would apply them."""
+    modules = _read_json(os.path.join(model_dir, "modules.json"), [])
+    pooling_path = next((m["path"] for m in modules if m["type"].endswith("Pooling")), "1_Pooling")
+    pooling = _read_json(os.path.join(model_dir, pooling_path, "config.json"), {})
+    st_config = _read_json(os.path.join(model_dir, "sentence_bert_config.json"), {})
+    return {
+        "pooling": "cls" if pooling.get("pooling_mode_cls_token") else "mean",
+        "normalize": any(m["type"].endswith("Normalize") for m in modules),
+        "max_seq_length": st_config.get("max_seq_length", 512),
+    }
+
+
+def _write_atomic(path: str, write) -> None:
+    """
+    Calls write(tmp_path) on a temp file next to path, then moves it into
+    place, so a worker loading the export never sees a half-written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def export_dir(model_name: str, cache_dir: str = ONNX_CACHE_DIR) -> str:
+    slug = re.sub(r"[^\w.-]+", "_", os.path.normpath(model_name).strip("./\\")) or "model"
+    return os.path.join(cache_dir, slug)
+
+
+def export_onnx(model_name: str, quantize: bool = True, cache_dir: str = ONNX_CACHE_DIR) -> str:
+    """Exports a sentence-transformers model to ONNX (and int8); returns the model file to load."""
+    import torch
+    from transformers import AutoModel
+
+    model_dir = _resolve_model_dir(model_name)
+    out_dir = export_dir(model_name, cache_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+
+    # Tokenizer and config first: a reader treats config plus model as a finished export
+    _write_atomic(os.path.join(out_dir, "tokenizer.json"),
+                  lambda tmp: shutil.copyfile(os.path.join(model_dir, "tokenizer.json"), tmp))
+
+    def write_config(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"model": model_name, **pooling_config(model_dir)}, f, indent=2)
+    _write_atomic(os.path.join(out_dir, CONFIG_NAME), write_config)
+
+    if not os.path.exists(fp32_path):
+        print(f"📦 Exporting {model_name} to ONNX...")
+        model = AutoModel.from_pretrained(model_dir).eval()
+        model.config.return_dict = False  # plain tuple outputs for the exporter
+        dummy = torch.ones((1, 8), dtype=torch.int64)
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        axes = {name: {0: "batch", 1: "sequence"} for name in names}
+        axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        def write_model(tmp):
+            with torch.no_grad():
+                torch.onnx.export(
+                    model, (dummy, dummy, torch.zeros_like(dummy)), tmp,
+                    input_names=names, output_names=["last_hidden_state"],
+                    dynamic_axes=axes, opset_version=OPSET,
+                    dynamo=False,  # TorchScript exporter; the dynamo one needs onnxscript
+                )
+        _write_atomic(fp32_path, write_model)
+
+    if not quantize:
+        return fp32_path
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+    if not os.path.exists(int8_path):
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            _write_atomic(int8_path,
+                          lambda tmp: quantize_dynamic(fp32_path, tmp, weight_type=QuantType.QInt8))
+        except ImportError as e:
+            raise RuntimeError("❌ int8 quantization needs the onnx package (uv add onnx), "
+                               "or set EMBEDDING_ONNX_QUANTIZE=0") from e
+        print(f"✅ Quantized model written to {int8_path}")
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings from an ONNX export of a sentence-transformers model. Vectors
+    match HuggingFaceEmbeddings for the same model up to quantization error
+    (see benchmarks/bench_embeddings.py). The model is exported on first use
+    if ONNX_CACHE_DIR has no export yet.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = ONNX_QUANTIZE, threads: int = ONNX_THREADS,
+                 batch_size: int = BATCH_SIZE, normalize: Optional[bool] = None,
+                 cache_dir: str = ONNX_CACHE_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        out_dir = export_dir(model_name, cache_dir)
+        model_path = os.path.join(out_dir, "model.int8.onnx" if quantize else "model.onnx")
+        config = _read_json(os.path.join(out_dir, CONFIG_NAME))
+        if config is None or not os.path.exists(model_path):
+            model_path = export_onnx(model_name, quantize=quantize, cache_dir=cache_dir)
+            config = _read_json(os.path.join(out_dir, CONFIG_NAME))
+
+        self.model_name = model_name
+        self.model_path = model_path
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"] if normalize is None else normalize
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(out_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+
+        if self.pooling == "cls":
+            vectors = hidden[:, 0]
+        else:
+            weights = mask[..., None].astype(hidden.dtype)
+            vectors = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embeddings as one (len(texts), dim) array, in input order."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Similar lengths share a batch, so little compute is spent on padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                result[i] = vector
+        return np.stack(result)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+
+def make_embeddings(model_name: str, normalize: Optional[bool] = None, backend: Optional[str] = None) -> Embeddings:
+    """The embedding model for EMBEDDING_BACKEND ("torch": HuggingFaceEmbeddings, "onnx": OnnxEmbeddings)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name, normalize=normalize)
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        encode_kwargs = {'normalize_embeddings': normalize} if normalize is not None else {}
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs=encode_kwargs,
+        )
+    raise ValueError(f"❌ Unknown EMBEDDING_BACKEND '{backend}' (use 'torch' or 'onnx')")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to ONNX.")
+    parser.add_argument("--export", required=True, metavar="MODEL", help="hub id or local model directory")
+    parser.add_argument("--fp32", action="store_true", help="skip int8 quantization")
+    args = parser.parse_args()
+    path = export_onnx(args.export, quantize=not args.fp32)
+    print(f"✅ {args.export} exported to {path}")
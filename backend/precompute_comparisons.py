@@ -0,0 +1,145 @@
+"""
+Precomputes every IPC<->BNS comparison into the /compare cache.
+
+The mapping table is small and finite, so all possible /compare answers can be
+generated offline: every IPC section with a mapping, every BNS parent section
+and every specific BNS clause named in the mappings. Results are written to the
+same SQLite store (compare_cache.py) that /compare reads, tagged source="batch".
+
+The job is resumable: keys already in the store for the current corpus, model
+and prompt version are skipped, and each answer is committed as soon as it
+arrives, so an interrupted run simply picks up where it stopped.
+
+Usage (from backend/):
+    python precompute_comparisons.py                  # everything missing
+    python precompute_comparisons.py --law BNS --rpm 20 --workers 2
+    python precompute_comparisons.py --dry-run        # only list what would run
+
+Groq calls take quota from the same shared bucket as the server
+(rate_limiter.py) at batch priority, so the job only uses what interactive
+/compare requests leave over, and rate-limited calls wait for the bucket to
+reopen instead of sleeping a fixed minute. --rpm additionally paces this job
+alone, without changing the shared bucket the server uses.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from compare_cache import CompareCache, normalize_section
+from mapper import LegalBackend
+from rate_limiter import BATCH, RateLimited
+
+# --- CONFIGURATION ---
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 3
+MAX_WAIT = 600          # seconds a batch call may wait for Groq quota
+
+
+class Pacer:
+    """Spaces this process's calls at least 60/rpm seconds apart, across worker threads."""
+
+    def __init__(self, rpm=None):
+        self.interval = 60 / rpm if rpm else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(slot - now)
+
+
+def comparison_keys(backend: LegalBackend, laws=("IPC", "BNS")):
+    """Every (law, section id) /compare can be asked about, normalised as /compare does."""
+    raw = []
+    if "IPC" in laws:
+        raw += [("IPC", ipc_id) for ipc_id in backend.ipc_to_bns]
+    if "BNS" in laws:
+        for parent, sources in backend.bns_to_ipc.items():
+            raw.append(("BNS", parent))
+            raw += [("BNS", s['specific_clause']) for s in sources if "(" in s['specific_clause']]
+
+    keys = []
+    for law, section in raw:
+        key = normalize_section(law, section)
+        if key[1] and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def compute(backend, cache, pacer, law, sec_id):
+    """Runs one comparison with retries; returns (law, sec_id, error or None)."""
+    query = f"{law} {sec_id}"
+    for attempt in range(MAX_RETRIES + 1):
+        pacer.wait()
+        result = backend.process_query(query)
+        error = result.get("error")
+        if not error:
+            cache.put(backend.compare_key(law, sec_id), result, source="batch")
+            return law, sec_id, None
+        if "retry_after" not in result or attempt == MAX_RETRIES:
+            return law, sec_id, error
+        # The bucket is paused until Groq's retry delay has passed
+        try:
+            backend.limiter.acquire_sync(backend.llm_token_estimate(query), priority=BATCH,
+                                         max_wait=MAX_WAIT, consume=False)
+        except RateLimited as e:
+            return law, sec_id, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute IPC<->BNS comparisons into the /compare cache.")
+    parser.add_argument("--law", choices=["IPC", "BNS"], help="only one direction")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parallel LLM calls")
+    parser.add_argument("--rpm", type=float, help="max LLM requests per minute for this job (on top of the shared GROQ_RPM)")
+    parser.add_argument("--limit", type=int, help="stop after this many comparisons")
+    parser.add_argument("--force", action="store_true", help="recompute keys that are already cached")
+    parser.add_argument("--dry-run", action="store_true", help="list pending comparisons and exit")
+    args = parser.parse_args()
+
+    backend = LegalBackend()
+    backend.llm_priority = BATCH
+    backend.llm_max_wait = MAX_WAIT
+    pacer = Pacer(args.rpm)
+    cache = CompareCache()
+    keys = comparison_keys(backend, (args.law,) if args.law else ("IPC", "BNS"))
+    pending = [k for k in keys if args.force or not cache.contains(backend.compare_key(*k))]
+    if args.limit is not None:
+        pending = pending[:args.limit]
+
+    print(f"📚 {len(keys)} comparisons in the mapping table, {len(keys) - len(pending)} already cached, "
+          f"{len(pending)} to compute (corpus {backend.corpus_version}).")
+    if args.dry_run or not pending:
+        for law, sec_id in pending if args.dry_run else []:
+            print(f"   {law} {sec_id}")
+        return
+
+    failures = []
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(compute, backend, cache, pacer, law, sec_id) for law, sec_id in pending]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                law, sec_id, error = future.result()
+                if error:
+                    failures.append((law, sec_id, error))
+                    print(f"❌ [{done}/{len(pending)}] {law} {sec_id}: {error}")
+                else:
+                    print(f"✅ [{done}/{len(pending)}] {law} {sec_id}")
+        except KeyboardInterrupt:
+            print("⏹️  Interrupted; finished comparisons are saved, rerun to resume.")
+            for future in futures:
+                future.cancel()
+            raise
+
+    elapsed = time.monotonic() - started
+    print(f"🏁 Done in {elapsed:.0f}s: {len(pending) - len(failures)} stored, {len(failures)} failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# --- CONFIGURATION ---
+HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKENS", "1500"))  # history tokens per prompt
+VERBATIM_TURNS = int(os.getenv("AGENT_HISTORY_VERBATIM", "1"))         # newest turns kept word for word
+MAX_HISTORY_TURNS = 10   # older turns are never considered
+CHARS_PER_TOKEN = 4      # rough estimate for English/Hindi legal text with Gemini's tokenizer
+
+_CITATIONS_RE = re.compile(r"<CITATIONS>(.*?)(?:</CITATIONS>|$)", re.S)
+_ANSWER_RE = re.compile(r"<LEGAL_ANSWER>(.*?)(?:</LEGAL_ANSWER>|$)", re.S)
+_CASE_ID_RE = re.compile(r"indiankanoon\.org/doc/(\d+)")
+# "**Section 303** of the **Bharatiya Nyaya Sanhita**" as the system prompt asks for
+_STATUTE_RE = re.compile(r"\*\*Section ([\w()]+)\*\* of the \*\*([^*]+)\*\*")
+_MARKDOWN_RE = re.compile(r"[*_#>`|\[\]]+|\(https?://[^)]*\)")
+_SENTENCE_RE = re.compile(r"(.+?[.!?।])(?:\s|$)")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _verbatim(turn: Dict) -> str:
+    return f"User: {turn['user']}\nAssistant: {turn['assistant']}"
+
+
+@lru_cache(maxsize=2048)
+def _compact(user: str, assistant: str) -> str:
+    """
+    A turn reduced to the question, the answer's first sentence and what it
+    cited (statutes and Indian Kanoon case ids). Deterministic and cached, so
+    a turn is compacted once however many follow-ups reuse it.
+    """
+    answer = _ANSWER_RE.search(assistant)
+    body = _MARKDOWN_RE.sub("", answer.group(1) if answer else assistant)
+    lines = [line.strip() for line in body.splitlines()
+             if line.strip() and not line.strip().startswith("Statutory Law")]
+    first = _SENTENCE_RE.match(" ".join(lines))
+    gist = (first.group(1) if first else " ".join(lines))[:300]
+
+    statutes = []
+    for section, act in _STATUTE_RE.findall(assistant):
+        cite = f"Section {section} {act.strip()}"
+        if cite not in statutes:
+            statutes.append(cite)
+    citations = _CITATIONS_RE.search(assistant)
+    case_ids = list(dict.fromkeys(_CASE_ID_RE.findall(citations.group(1) if citations else assistant)))
+
+    cited = "; ".join(statutes[:8] + [f"case {doc_id}" for doc_id in case_ids[:5]])
+    return f"User: {user}\nAssistant (summary): {gist}" + (f"\nCited: {cited}" if cited else "")
+
+
+class HistoryAssembler:
+    """
+    Builds the agent's input from a session's turns within a token budget.
+
+    The newest verbatim_turns turns are kept word for word when they fit;
+    older ones are replaced by their compact form (first sentence + citations),
+    and turns that no longer fit are dropped, oldest first. A follow-up
+    question therefore costs at most `budget` tokens more than a first one.
+    Counters cover every prompt assembled by this worker.
+    """
+
+    def __init__(self, budget: int = HISTORY_TOKEN_BUDGET, verbatim_turns: int = VERBATIM_TURNS):
+        self.budget = budget
+        self.verbatim_turns = verbatim_turns
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.history_tokens = 0
+        self.tokens_saved = 0      # verbatim history tokens avoided by compacting/dropping
+        self.turns_verbatim = 0
+        self.turns_compacted = 0
+        self.turns_dropped = 0
+
+    def assemble(self, turns: List[Dict], user_input: str) -> Tuple[str, Dict]:
+        """Returns (composed input, stats for this prompt)."""
+        turns = turns[-MAX_HISTORY_TURNS:]
+        blocks, used = [], 0
+        verbatim = compacted = dropped = 0
+        full_tokens = sum(estimate_tokens(_verbatim(turn)) for turn in turns)
+
+        # Newest first, so the budget goes to the most relevant context
+        for age, turn in enumerate(reversed(turns)):
+            full = _verbatim(turn)
+            candidates = [full] if age < self.verbatim_turns else []
+            candidates.append(_compact(turn["user"], turn["assistant"]))
+            for block in candidates:
+                cost = estimate_tokens(block)
+                if used + cost <= self.budget:
+                    blocks.append(block)
+                    used += cost
+                    if block is full:
+                        verbatim += 1
+                    else:
+                        compacted += 1
+                    break
+            else:
+                # Out of budget: this turn and everything older is dropped
+                dropped = len(turns) - age
+                break
+
+        if blocks:
+            history_text = "\n\n".join(reversed(blocks))
+            composed = (
+                "Below is the previous conversation between the user and you. "
+                "Use it as context to answer the user's new follow-up question.\n\n"
+                f"{history_text}\n\n"
+                f"User: {user_input}\nAssistant:"
+            )
+        else:
+            composed = user_input
+
+        stats = {
+            "turns": len(turns),
+            "verbatim": verbatim,
+            "compacted": compacted,
+            "dropped": dropped,
+            "history_tokens": used,
+            "history_tokens_uncompacted": full_tokens,
+            "input_tokens": estimate_tokens(composed),
+            "budget": self.budget,
+        }
+        with self._lock:
+            self.prompts += 1
+            self.history_tokens += used
+            self.tokens_saved += full_tokens - used
+            self.turns_verbatim += verbatim
+            self.turns_compacted += compacted
+            self.turns_dropped += dropped
+        return composed, stats
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "prompts": self.prompts,
+                "avg_history_tokens": round(self.history_tokens / self.prompts, 1) if self.prompts else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "turns_verbatim": self.turns_verbatim,
+                "turns_compacted": self.turns_compacted,
+                "turns_dropped": self.turns_dropped,
+                "compact_cache": _compact.cache_info()._asdict(),
+            }
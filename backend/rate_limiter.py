@@ -0,0 +1,358 @@
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+# --- CONFIGURATION ---
+RATE_LIMIT_DB_PATH = os.getenv(
+    "RATE_LIMIT_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_limits.sqlite3"))
+# Free-tier quotas per provider (requests/minute, tokens/minute); override e.g. GROQ_RPM=60 GROQ_TPM=60000
+DEFAULT_LIMITS = {
+    "gemini": (10, 250_000),
+    "groq": (30, 12_000),
+}
+MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))  # longest a call waits for quota before RateLimited
+DEFAULT_COOLDOWN = 60.0   # seconds to pause a bucket after a 429 that names no retry delay
+POLL_INTERVAL = 1.0       # waiters re-check the shared bucket at least this often
+
+# Lower number = more urgent. A priority may only spend the bucket down to its
+# reserve, so interactive calls still find quota while agents and batch jobs
+# run, in every worker sharing the bucket.
+INTERACTIVE, AGENT, BATCH = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", AGENT: "agent", BATCH: "batch"}
+RESERVE = {INTERACTIVE: 0.0, AGENT: 0.2, BATCH: 0.5}
+
+_RETRY_AFTER_RE = re.compile(
+    r"(?:retry in|try again in|retry_?delay\W*)\s*(?:(\d+)m)?\s*([\d.]+)\s*(ms|s)?", re.I)
+
+
+class RateLimited(Exception):
+    """A provider's quota is exhausted for at least retry_after seconds."""
+
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f"{bucket} rate limit reached; retry in {retry_after:.0f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+def is_rate_limit_error(error) -> bool:
+    """Whether a provider error (or its message) means 429 / quota exhausted."""
+    if isinstance(error, RateLimited):
+        return True
+    error_msg = str(error).lower()
+    return (
+        "429" in error_msg
+        or "rate limit" in error_msg
+        or "rate_limit" in error_msg
+        or "quota" in error_msg
+        or "resource_exhausted" in error_msg
+    )
+
+
+def retry_after_from_error(error, default: float = DEFAULT_COOLDOWN) -> float:
+    """The retry delay a 429 asks for ("Please try again in 7.5s", "retryDelay: '37s'"), else default."""
+    if isinstance(error, RateLimited):
+        return error.retry_after
+    match = _RETRY_AFTER_RE.search(str(error))
+    if not match:
+        return default
+    minutes, value, unit = match.groups()
+    seconds = float(value) / 1000 if unit == "ms" else float(value)
+    return seconds + 60 * int(minutes or 0)
+
+
+class TokenBucket:
+    """
+    Client-side quota for one provider and model, shared through SQLite by
+    every uvicorn worker and batch job on the host.
+
+    Requests and tokens refill continuously up to rpm / tpm per minute. A
+    caller takes one request plus its estimated tokens, or learns how long to
+    wait; waiting is asynchronous in acquire() and only bounded blocking in
+    acquire_sync(). Within a process, waiters of a more urgent priority go
+    first; across processes, the per-priority reserve keeps headroom for them.
+    A 429 from the provider pauses the whole bucket (cool_down) for the delay
+    the provider asked for.
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float, path: str = RATE_LIMIT_DB_PATH):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._waiting = Counter()
+        self.granted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.cooldowns = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    name TEXT PRIMARY KEY,
+                    requests REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    blocked_until REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _refilled(self, row, now: float) -> Tuple[float, float, float]:
+        if row is None:
+            return self.rpm, self.tpm, 0.0
+        requests, tokens, updated, blocked_until = row
+        elapsed = max(0.0, now - updated)
+        return (min(self.rpm, requests + elapsed * self.rpm / 60),
+                min(self.tpm, tokens + elapsed * self.tpm / 60),
+                blocked_until)
+
+    def _take(self, tokens: int, priority: int, consume: bool) -> float:
+        """Takes quota if available (atomically across processes); returns 0 or the seconds to wait."""
+        with self._lock:
+            if any(self._waiting[p] for p in range(priority)):
+                return POLL_INTERVAL  # a more urgent caller in this process goes first
+
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT requests, tokens, updated, blocked_until FROM rate_buckets WHERE name = ?",
+                (self.name,)).fetchone()
+            requests, available, blocked_until = self._refilled(row, now)
+            if now < blocked_until:
+                wait = blocked_until - now
+            else:
+                reserve = RESERVE.get(priority, 0.0)
+                # A single call larger than the whole allowance would otherwise wait forever
+                tokens = min(tokens, self.tpm * (1 - reserve))
+                wait = max(0.0,
+                           (1 + self.rpm * reserve - requests) * 60 / self.rpm,
+                           (tokens + self.tpm * reserve - available) * 60 / self.tpm)
+            if wait == 0 and consume:
+                requests -= 1
+                available -= tokens
+            conn.execute("INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?, ?, ?)",
+                         (self.name, requests, available, now, blocked_until))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def _enter(self, priority: int):
+        with self._lock:
+            self._waiting[priority] += 1
+
+    def _leave(self, priority: int, granted: bool, waited: bool):
+        with self._lock:
+            self._waiting[priority] -= 1
+            if granted:
+                self.granted += 1
+                self.delayed += waited
+            else:
+                self.rejected += 1
+
+    async def acquire(self, tokens: int = 0, priority: int = INTERACTIVE,
+                      max_wait: float = MAX_WAIT, consume: bool = True):
+        """
+        Waits (without blocking the event loop) until the bucket has room for
+        one request of `tokens`, then takes it. consume=False only waits for
+        headroom, e.g. before handing work to a thread that takes it itself.
+        Raises RateLimited when that would take longer than max_wait.
+        """
+        deadline = time.monotonic() + max_wait
+        waited = False
+        self._enter(priority)
+        try:
+            while True:
+                wait = await asyncio.to_thread(self._take, tokens, priority, consume)
+                if wait <= 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    raise RateLimited(self.name, wait)
+                waited = True
+                await asyncio.sleep(min(wait, POLL_INTERVAL))
+        except BaseException:
+            self._leave(priority, granted=False, waited=waited)
+            raise
+        self._leave(priority, granted=True, waited=waited)
+
+    def acquire_sync(self, tokens: int = 0, priority: int = INTERACTIVE,
+                     max_wait: float = MAX_WAIT, consume: bool = True):
+        """acquire() for worker threads and scripts: blocks this thread for at most max_wait."""
+        deadline = time.monotonic() + max_wait
+        waited = False
+        self._enter(priority)
+        try:
+            while True:
+                wait = self._take(tokens, priority, consume)
+                if wait <= 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    raise RateLimited(self.name, wait)
+                waited = True
+                time.sleep(min(wait, POLL_INTERVAL))
+        except BaseException:
+            self._leave(priority, granted=False, waited=waited)
+            raise
+        self._leave(priority, granted=True, waited=waited)
+
+    def debit(self, tokens: float):
+        """Corrects the bucket once a call's real token usage is known (may be negative)."""
+        if not tokens:
+            return
+        with self._connect() as conn:
+            conn.execute("UPDATE rate_buckets SET tokens = MAX(tokens - ?, ?) WHERE name = ?",
+                         (tokens, -self.tpm, self.name))
+
+    def cool_down(self, seconds: float):
+        """Pauses the bucket for every process, e.g. after the provider answered 429."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO rate_buckets VALUES (?, 0, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    requests = 0, updated = excluded.updated,
+                    blocked_until = MAX(blocked_until, excluded.blocked_until)
+            """, (self.name, self.tpm, now, now + seconds))
+        with self._lock:
+            self.cooldowns += 1
+        print(f"⚠️ {self.name} rate limited by the provider; pausing {seconds:.0f}s")
+
+    def penalize(self, error) -> RateLimited:
+        """cool_down() for a provider 429 error; returns the RateLimited to raise in its place."""
+        retry_after = retry_after_from_error(error)
+        if not isinstance(error, RateLimited):
+            self.cool_down(retry_after)
+        return RateLimited(self.name, retry_after)
+
+    def headroom(self) -> Dict:
+        """Quota available right now, for /rate-limits and /metrics."""
+        now = time.time()
+        row = self._connect().execute(
+            "SELECT requests, tokens, updated, blocked_until FROM rate_buckets WHERE name = ?",
+            (self.name,)).fetchone()
+        requests, tokens, blocked_until = self._refilled(row, now)
+        with self._lock:
+            waiting = {PRIORITY_NAMES[p]: n for p, n in self._waiting.items() if n}
+            counters = {"granted": self.granted, "delayed": self.delayed,
+                        "rejected": self.rejected, "cooldowns": self.cooldowns}
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests_available": round(max(0.0, requests), 2),
+            "tokens_available": int(max(0.0, tokens)),
+            "blocked_for": round(max(0.0, blocked_until - now), 1),
+            "waiting": waiting,
+            **counters,
+        }
+
+
+class BucketRateLimiter(BaseRateLimiter):
+    """
+    Plugs a TokenBucket into a LangChain chat model (rate_limiter=...), so
+    every model call of an agent run takes quota at the given priority.
+    Token use per call is not known up front, so a fixed estimate is taken.
+    """
+
+    def __init__(self, bucket: TokenBucket, priority: int = AGENT, tokens_per_call: int = 0,
+                 max_wait: float = MAX_WAIT):
+        self.bucket = bucket
+        self.priority = priority
+        self.tokens_per_call = tokens_per_call
+        self.max_wait = max_wait
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        try:
+            self.bucket.acquire_sync(self.tokens_per_call, self.priority,
+                                     max_wait=self.max_wait if blocking else 0)
+        except RateLimited:
+            if blocking:
+                raise
+            return False
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        try:
+            await self.bucket.acquire(self.tokens_per_call, self.priority,
+                                      max_wait=self.max_wait if blocking else 0)
+        except RateLimited:
+            if blocking:
+                raise
+            return False
+        return True
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(provider: str, model: str) -> TokenBucket:
+    """The shared bucket for one provider and model (limits from <PROVIDER>_RPM / <PROVIDER>_TPM)."""
+    name = f"{provider}:{model}"
+    with _buckets_lock:
+        if name not in _buckets:
+            rpm, tpm = DEFAULT_LIMITS.get(provider, (60, 1_000_000))
+            prefix = provider.upper()
+            _buckets[name] = TokenBucket(
+                name,
+                rpm=float(os.getenv(f"{prefix}_RPM", rpm)),
+                tpm=float(os.getenv(f"{prefix}_TPM", tpm)),
+            )
+        return _buckets[name]
+
+
+def headroom() -> Dict[str, Dict]:
+    """headroom() of every bucket this process has used."""
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    return {bucket.name: bucket.headroom() for bucket in buckets}
+
+
+async def call_with_retries(call, bucket: TokenBucket, priority: int = INTERACTIVE,
+                            retries: int = 3, max_wait: float = 3 * DEFAULT_COOLDOWN):
+    """
+    Awaits `call()` (a coroutine function) once the bucket has headroom, and
+    when it raises RateLimited, schedules the retry for when the bucket
+    reopens instead of sleeping in a worker thread. Gives up after `retries`
+    retries or when the provider's pause is longer than max_wait.
+    """
+    for attempt in range(retries + 1):
+        await bucket.acquire(priority=priority, max_wait=max_wait, consume=False)
+        try:
+            return await call()
+        except RateLimited as e:
+            if attempt == retries:
+                raise
+            print(f"⏳ {bucket.name}: retry {attempt + 1}/{retries} scheduled in {math.ceil(e.retry_after)}s")
+
+
+def call_with_retries_sync(call, bucket: TokenBucket, priority: int = INTERACTIVE,
+                           retries: int = 3, max_wait: float = 3 * DEFAULT_COOLDOWN):
+    """call_with_retries() for scripts and the CLI, where blocking is fine."""
+    for attempt in range(retries + 1):
+        bucket.acquire_sync(priority=priority, max_wait=max_wait, consume=False)
+        try:
+            return call()
+        except RateLimited as e:
+            if attempt == retries:
+                raise
+            print(f"⏳ {bucket.name}: retry {attempt + 1}/{retries} scheduled in {math.ceil(e.retry_after)}s")
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# --- CONFIGURATION ---
+# "1": load every registered resource in a background thread at startup
+# "0": load each one on first use
+PRELOAD = os.getenv("PRELOAD_RESOURCES", "1") == "1"
+# After preloading, run each warm-up (a synthetic query) so the first real request is not the slow one
+WARMUP = os.getenv("WARMUP_RESOURCES", "0") == "1"
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class ResourceUnavailable(RuntimeError):
+    """A resource failed to load (or did not finish loading in time)."""
+
+
+class _Resource:
+    def __init__(self, name: str, loader: Callable[[], Any], critical: bool):
+        self.name = name
+        self.loader = loader
+        self.critical = critical
+        self.state = PENDING
+        self.value = None
+        self.error: Optional[str] = None
+        self.exception: Optional[BaseException] = None
+        self.seconds: Optional[float] = None
+        self.done = threading.Event()
+
+
+class ResourceRegistry:
+    """
+    Heavy, process-wide resources (embedding models, vector stores, indexes)
+    by name, each loaded exactly once: on first get(), or earlier by
+    preload() in a background thread, so the server accepts connections
+    before they are ready.
+
+    Loaders may get() other resources, which loads them first. A failed load
+    is reported by status() and retried on the next get(). Only "critical"
+    resources decide readiness; the rest report their state for /readyz.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, _Resource] = {}
+        self._warmups: Dict[str, Callable[[], Any]] = {}
+        self._warmup_state: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], critical: bool = False):
+        with self._lock:
+            self._resources[name] = _Resource(name, loader, critical)
+
+    def add_warmup(self, name: str, fn: Callable[[], Any]):
+        """A synthetic query run by preload(warm_up=True) once the resources are loaded."""
+        with self._lock:
+            self._warmups[name] = fn
+            self._warmup_state[name] = {"state": PENDING}
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """The loaded resource; loads it in this thread, or waits for the thread already loading it."""
+        resource = self._resources[name]
+        with self._lock:
+            load_here = resource.state in (PENDING, FAILED)
+            if load_here:
+                resource.state = LOADING
+                resource.done.clear()
+
+        if load_here:
+            self._load(resource)
+        elif not resource.done.wait(timeout):
+            raise ResourceUnavailable(f"{name} is still loading")
+
+        if resource.state != READY:
+            raise ResourceUnavailable(f"{name} failed to load: {resource.error}") from resource.exception
+        return resource.value
+
+    def peek(self, name: str) -> Any:
+        """The resource if it is already loaded, else None (never blocks or loads)."""
+        resource = self._resources[name]
+        return resource.value if resource.state == READY else None
+
+    def _load(self, resource: _Resource):
+        print(f"⏳ Loading {resource.name}...")
+        started = time.perf_counter()
+        try:
+            resource.value = resource.loader()
+            resource.error = resource.exception = None
+            resource.state = READY
+            print(f"✅ {resource.name} ready ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            resource.error = f"{type(e).__name__}: {e}"
+            resource.exception = e
+            resource.state = FAILED
+            print(f"❌ {resource.name} failed to load: {resource.error}")
+        finally:
+            resource.seconds = round(time.perf_counter() - started, 3)
+            resource.done.set()
+
+    def preload(self, names: Optional[Iterable[str]] = None, warm_up: bool = WARMUP) -> threading.Thread:
+        """Loads resources (all by default, in registration order) and optionally warms up, in the background."""
+        names = list(names) if names is not None else list(self._resources)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except ResourceUnavailable:
+                    pass  # Reported by status(); the next get() retries
+            if warm_up:
+                self.warm_up()
+
+        thread = threading.Thread(target=run, name="resource-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def warm_up(self):
+        """Runs every warm-up once (blocking)."""
+        for name, fn in list(self._warmups.items()):
+            self._warmup_state[name] = {"state": LOADING}
+            started = time.perf_counter()
+            try:
+                fn()
+                self._warmup_state[name] = {"state": READY}
+            except Exception as e:
+                self._warmup_state[name] = {"state": FAILED, "error": f"{type(e).__name__}: {e}"}
+            self._warmup_state[name]["seconds"] = round(time.perf_counter() - started, 3)
+            print(f"🔥 Warm-up {name}: {self._warmup_state[name]['state']} "
+                  f"({self._warmup_state[name]['seconds']:.1f}s)")
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """One resource's readiness, or, without a name, whether every critical resource is loaded."""
+        if name is not None:
+            return self._resources[name].state == READY
+        return all(r.state == READY for r in self._resources.values() if r.critical)
+
+    def status(self) -> Dict[str, Any]:
+        resources = {
+            name: {"state": r.state, "critical": r.critical, "seconds": r.seconds,
+                   **({"error": r.error} if r.error else {})}
+            for name, r in list(self._resources.items())
+        }
+        return {"ready": self.is_ready(), "resources": resources, "warm_up": dict(self._warmup_state)}
+
+
+# Shared by the server and the modules that register resources at import time
+registry = ResourceRegistry()
@@ -0,0 +1,107 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# --- CONFIGURATION ---
+# A marker opens a line: "(1) Whoever...", "(a) being a...", "(iv) on a woman..."
+_MARKER_RE = re.compile(r"^[ \t]*\(([0-9]{1,3}[A-Z]?|[a-z]{1,2}|[ivxl]{1,6}|[A-Z])\)[ \t]*", re.MULTILINE)
+_ROMAN_RE = re.compile(r"^(x{0,3})(ix|iv|v?i{0,3})$")
+_PARENT_RE = re.compile(r"[\(\s]")
+
+
+def _marker_kind(token: str, open_kinds: Dict[str, str]) -> str:
+    """
+    Level of a marker: "num" (1), "alpha" (a), "roman" (iv) or "upper" (A).
+    "(i)", "(v)" and "(x)" are letters when they continue an open letter
+    sequence ("(h)" -> "(i)"), otherwise roman numerals.
+    """
+    if token[0].isdigit():
+        return "num"
+    if token.isupper():
+        return "upper"
+    previous = open_kinds.get("alpha")
+    if len(token) == 1 and previous and len(previous) == 1 and ord(token) == ord(previous) + 1:
+        return "alpha"
+    if _ROMAN_RE.match(token):
+        return "roman"
+    return "alpha"
+
+
+def parse_section(text: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parses one section's text into its subsection/clause tree in a single pass.
+    Returns {"(1)": (start, end), "(2)(a)": (start, end), ...}: character spans
+    into `text`. A node's span covers its own text and all of its children and
+    runs until the next marker at the same or a higher level.
+    """
+    spans: Dict[str, Tuple[int, int]] = {}
+    # Open nodes, outermost first: (kind, token, path, start)
+    stack: List[Tuple[str, str, str, int]] = []
+
+    def close_to(depth, end):
+        while len(stack) > depth:
+            _, _, path, start = stack.pop()
+            spans[path] = (start, end)
+
+    for match in _MARKER_RE.finditer(text):
+        token = match.group(1)
+        kind = _marker_kind(token, {k: t for k, t, _, _ in stack})
+        depth = next((i for i, (k, _, _, _) in enumerate(stack) if k == kind), len(stack))
+        close_to(depth, match.start())
+        parent_path = stack[-1][2] if stack else ""
+        path = f"{parent_path}({token.lower()})"
+        if path in spans:
+            # Repeated marker (e.g. a second list of Illustrations): keep the first
+            continue
+        stack.append((kind, token, path, match.start()))
+
+    close_to(0, len(text))
+    return spans
+
+
+def split_section_id(section_id: str) -> Tuple[str, str]:
+    """"2(1)(a)" -> ("2", "(1)(a)"); "302" -> ("302", "")."""
+    section_id = re.sub(r"\s+", "", str(section_id)).lower()
+    parent = _PARENT_RE.split(section_id, 1)[0]
+    return parent, section_id[len(parent):]
+
+
+class SectionIndex:
+    """
+    Every section of one law, parsed once into subsection/clause spans, with
+    O(1) lookup of any node by id: "2", "2(1)", "64(2)(a)(i)" (case-insensitive).
+    """
+
+    def __init__(self, records: Iterable[dict], text_key: str = "section_desc"):
+        self.texts: Dict[str, str] = {}
+        self.nodes: Dict[str, Tuple[str, int, int]] = {}
+        for record in records:
+            parent = str(record.get("Section", "")).strip().lower()
+            text = record.get(text_key) or ""
+            if not parent or parent in self.texts:
+                continue
+            self.texts[parent] = text
+            for path, (start, end) in parse_section(text).items():
+                self.nodes[parent + path] = (parent, start, end)
+
+    def __contains__(self, section_id) -> bool:
+        return self.get(section_id) is not None
+
+    def get(self, section_id: str) -> Optional[str]:
+        """Text of a section or of one of its subsections/clauses; None if unknown."""
+        parent, path = split_section_id(section_id)
+        if not path:
+            return self.texts.get(parent)
+        node = self.nodes.get(parent + path)
+        if node is None:
+            return None
+        parent, start, end = node
+        return self.texts[parent][start:end].strip()
+
+    def children(self, section_id: str) -> List[str]:
+        """Ids of the direct subsections/clauses of a node, in text order."""
+        prefix = "".join(split_section_id(section_id))
+        found = [
+            (start, node_id) for node_id, (_, start, _) in self.nodes.items()
+            if node_id.startswith(prefix + "(") and node_id.count("(") == prefix.count("(") + 1
+        ]
+        return [node_id for _, node_id in sorted(found)]
@@ -1,32 +1,53 @@
+import asyncio
+import json
+import math
+import os
+import uuid
 from typing import Optional, List, Dict, Any
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
 # Import the logic class from the other file
 from mapper import LegalBackend
-from gemini_agent_core import GeminiLegalAgent
+from gemini_agent_core import GeminiLegalAgent, search_cache
 import indian_kanoon_lib as ik_api
+from compare_cache import CompareCache, CompareKey, SERVE_STALE, normalize_section
+from worker_pools import POOLS, Saturated, agent_pool, compare_pool, kanoon_pool
+import rate_limiter
+from rate_limiter import AGENT, BATCH, INTERACTIVE, RateLimited, call_with_retries
+from resources import PRELOAD, registry
 
 # ==========================================
 # 1. SETUP & LIFECYCLE
 # ==========================================
-backend = LegalBackend()
+# The legal index snapshot loads in milliseconds and /compare needs it, so it
+# loads now; the RAG stack (embeddings, Chroma, BM25) loads in the background.
+registry.register("legal_index", LegalBackend, critical=True)
+backend = registry.get("legal_index")
 agent = None  # Initialize as None, will be loaded when first needed
+compare_cache = CompareCache()
+_refreshing = set()  # compare keys with a background refresh in flight
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+COMPARE_MODES = ("auto", "official", "local", "llm")
+REFRESH_MAX_WAIT = 300  # seconds a background refresh may wait for Groq quota
 
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     # Load heavy JSON data only once on startup
-#     backend.load_data()
-#     yield
-#     # Cleanup (optional)
-
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD:
+        registry.preload()
+    yield
+    # Close the pooled Indian Kanoon connections
+    await ik_api.aclose()
+    for pool in POOLS.values():
+        pool.shutdown()
 
 
 # Initialize FastAPI app before using it
-app = FastAPI(title="Legal Diff Engine")
+app = FastAPI(title="Legal Diff Engine", lifespan=lifespan)
 
 # Enable CORS for frontend requests
 app.add_middleware(
@@ -37,6 +58,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Saturated)
+async def saturated_handler(request, exc: Saturated):
+    """Shed load quickly when a worker pool is full instead of queueing without bound."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy ({exc.pool}). Please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request, exc: RateLimited):
+    """The LLM provider's quota is exhausted for longer than a request should wait."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"LLM quota exhausted ({exc.bucket}). Please retry shortly."},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
 # ==========================================
 # 2. DATA MODELS
 # ==========================================
@@ -44,6 +83,7 @@ class LegalRequest(BaseModel):
     law_type: str            # "IPC" or "BNS"
     section: str             # "33", "420", "2"
     subsection: Optional[str] = None  # "1", "a", or null
+    mode: Optional[str] = "auto"  # "auto", "official", "local" or "llm" (see /compare)
 
 class ComparisonResponse(BaseModel):
     status: str
@@ -53,10 +93,12 @@ class ComparisonResponse(BaseModel):
 
 class AgentRequest(BaseModel):
     query: str
+    session_id: Optional[str] = None  # Omit to start a new conversation
 
 class AgentResponse(BaseModel):
     status: str
     response: str
+    session_id: str  # Send back with follow-up questions
 
 class CaseLawSearchRequest(BaseModel):
     query: str
@@ -65,6 +107,7 @@ class CaseLawSearchRequest(BaseModel):
     to_date: Optional[str] = None  # Format: YYYY-MM-DD
     sort_by: Optional[str] = "relevance"  # 'relevance', 'date', 'citations'
     max_results: Optional[int] = 10
+    stream: Optional[bool] = False  # NDJSON, one case per line as pages arrive
 
 class CaseLawResponse(BaseModel):
     status: str
@@ -75,6 +118,25 @@ class CaseLawResponse(BaseModel):
 # 3. ENDPOINTS
 # ==========================================
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(resource: Optional[str] = None):
+    """
+    Readiness: 200 once the resources /compare and /case-law need are loaded
+    (the RAG stack may still be warming up; see "resources"). With
+    ?resource=<name>, 200 only once that resource is loaded, e.g.
+    ?resource=vector_db before sending /agent traffic.
+    """
+    status = registry.status()
+    if resource is not None and resource not in status["resources"]:
+        raise HTTPException(status_code=404, detail=f"Unknown resource '{resource}'")
+    ready = registry.is_ready(resource)
+    return JSONResponse(status_code=200 if ready else 503, content={**status, "ready": ready})
+
 def get_agent():
     """Lazy initialization of the agent to avoid startup delays"""
     global agent
@@ -85,47 +147,130 @@ def get_agent():
             raise HTTPException(status_code=500, detail=f"Failed to initialize legal agent: {str(e)}")
     return agent
 
+def _compute_comparison(key: CompareKey, query: str):
+    """Runs the LLM comparison and caches it (blocking; runs on the compare pool)."""
+    result = backend.process_query(query)
+    if "error" not in result:
+        compare_cache.put(key, result)
+    return result
+
+async def _refresh_comparison(key: CompareKey, query: str):
+    """Recomputes one stale or rate-limited comparison (runs as a background task)."""
+    try:
+        # Waits for Groq quota here, not in a compare thread, and behind interactive requests
+        estimate = await asyncio.to_thread(backend.llm_token_estimate, query)
+        await backend.limiter.acquire(estimate, priority=BATCH, max_wait=REFRESH_MAX_WAIT, consume=False)
+        await compare_pool.run(_compute_comparison, key, query)
+    except (Saturated, RateLimited):
+        pass  # Keep serving the stale answer; a later request retries the refresh
+    finally:
+        _refreshing.discard(key)
+
 @app.post("/compare")
-async def compare_laws(request: LegalRequest):
+async def compare_laws(request: LegalRequest, background_tasks: BackgroundTasks):
     """
     Comparison Endpoint.
     - For BNS 2(1): Send {"law_type": "BNS", "section": "2", "subsection": "1"}
     - For IPC 33: Send {"law_type": "IPC", "section": "33"}
+    Answers come from the persistent compare cache when available; stale
+    entries are served immediately and refreshed in the background.
+    - "mode": "official" returns the summary from the government's BNS/IPC
+      correspondence table (with the local diff); "local" returns only a
+      deterministic word/clause diff; both are instant and skip the LLM and
+      the cache. "llm" asks Groq. "auto" (default) is "official" where the
+      table covers the section and "llm" otherwise.
     """
-    law = request.law_type.upper()
-    sec_id = request.section.strip()
+    if request.mode not in COMPARE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(COMPARE_MODES)}")
 
-    # Only BNS supports subsection
-    if law == "BNS" and request.subsection:
-        clean_sub = request.subsection.strip().replace("(", "").replace(")", "")
-        sec_id = f"{sec_id}({clean_sub})"
+    law, sec_id = normalize_section(request.law_type, request.section, request.subsection)
+    if sec_id is None:
+        raise HTTPException(status_code=404, detail="No section number found.")
 
     query = law + " " + sec_id
-    print({query})
+    if request.mode != "llm":
+        # The local diff is CPU work; keep it off the event loop
+        result = await asyncio.to_thread(
+            backend.process_query, query, "official" if request.mode == "auto" else request.mode)
+        if "error" not in result:
+            return result
+        # "auto" falls through to the LLM only when the official table has no summary
+        if not (request.mode == "auto" and result.get("official_missing")):
+            raise HTTPException(status_code=404, detail=result["error"])
 
-    result = backend.process_query(query)
-    print(result)
+    key = backend.compare_key(law, sec_id)
 
+    cached = await asyncio.to_thread(compare_cache.get, key)
+    if cached is not None:
+        result, stale = cached
+        if stale and SERVE_STALE and key not in _refreshing:
+            _refreshing.add(key)
+            background_tasks.add_task(_refresh_comparison, key, query)
+        if not stale or SERVE_STALE:
+            return result
+
+    # Wait for Groq quota without holding a compare thread; 503 if it is far off
+    estimate = await asyncio.to_thread(backend.llm_token_estimate, query)
+    await backend.limiter.acquire(estimate, priority=INTERACTIVE, consume=False)
+    result = await compare_pool.run(_compute_comparison, key, query)
+
+    if "retry_after" in result:
+        # Rate limited by Groq: compute it in the background once quota returns
+        if key not in _refreshing:
+            _refreshing.add(key)
+            background_tasks.add_task(_refresh_comparison, key, query)
+        raise RateLimited(backend.limiter.name, result["retry_after"])
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
 
     return result
 
+@app.delete("/admin/compare-cache")
+async def invalidate_compare_cache(
+    law: Optional[str] = None,
+    section: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """
+    Drops cached comparisons, optionally only for one law and/or section
+    (e.g. ?law=BNS&section=2(1)). Requires the X-Admin-Token header to
+    match the ADMIN_TOKEN environment variable.
+    """
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if law:
+        law = "BNS" if "BNS" in law.upper() else "IPC"
+    if section:
+        # Without a law, drop the section under both codes
+        _, section = normalize_section(law or "IPC", section)
+        if section is None:
+            raise HTTPException(status_code=400, detail="Invalid section number")
+    removed = compare_cache.invalidate(law=law, section=section)
+    return {"status": "success", "removed": removed}
+
 @app.post("/agent", response_model=AgentResponse)
 async def query_legal_agent(request: AgentRequest):
     """
     Legal Agent Endpoint - Uses LangChain agent for comprehensive legal research
-    Send a legal query and get AI-powered analysis with citations
+    Send a legal query and get AI-powered analysis with citations.
+    Follow-up questions reuse the returned session_id.
     """
+    session_id = request.session_id or uuid.uuid4().hex
     try:
-        legal_agent = get_agent()
-        response = legal_agent.query(request.query)
+        legal_agent = await agent_pool.run(get_agent)
+        # Rate-limited runs are retried when the Gemini bucket reopens, without holding a thread
+        response = await call_with_retries(
+            lambda: agent_pool.run(legal_agent.query, request.query, session_id),
+            legal_agent.limiter, priority=AGENT)
         
         return AgentResponse(
             status="success",
-            response=response
+            response=response,
+            session_id=session_id
         )
         
+    except (Saturated, RateLimited, HTTPException):
+        raise
     except Exception as e:
         error_msg = str(e)
         if "rate limit" in error_msg.lower() or "413" in error_msg or "429" in error_msg:
@@ -133,62 +278,109 @@ async def query_legal_agent(request: AgentRequest):
         else:
             raise HTTPException(status_code=500, detail=f"Agent query failed: {error_msg}")
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/agent/stream")
+async def stream_legal_agent(request: AgentRequest):
+    """
+    Streaming variant of /agent (Server-Sent Events). Emits, as they happen:
+      session {session_id}, tool_start {tool, input},
+      tool_end {tool, sections, case_ids}, token {text}, then
+      final {response} (same text /agent would return) or error {detail}.
+    """
+    # Reject up front while a clean 503 is still possible
+    agent_pool.check()
+    legal_agent = await agent_pool.run(get_agent)
+    await legal_agent.limiter.acquire(priority=AGENT, consume=False)
+    session_id = request.session_id or uuid.uuid4().hex
+
+    async def events():
+        yield _sse("session", {"session_id": session_id})
+        try:
+            async with agent_pool.slot():
+                async for event in legal_agent.astream(request.query, session_id):
+                    yield _sse(event.pop("type"), event)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Agent query failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _case_from_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": doc.get('tid'),
+        "title": doc.get('title', 'Untitled'),
+        "court": doc.get('doctype', 'Unknown Court'),
+        "date": doc.get('publishdate', '') or 'N/A',
+        "cite_count": doc.get('numcites', 0),
+        "link": f"https://indiankanoon.org/doc/{doc.get('tid')}/"
+    }
+
+async def _iter_cases(request: CaseLawSearchRequest):
+    """Unique cases for the request, in Kanoon relevance order, as pages arrive."""
+    async for doc in ik_api.aiter_search_results(
+        query=request.query,
+        max_results=request.max_results or 10,
+        court=request.court,
+        from_date=request.from_date,
+        to_date=request.to_date,
+    ):
+        yield _case_from_doc(doc)
+
 @app.post("/case-law/search", response_model=CaseLawResponse)
 async def search_case_law(request: CaseLawSearchRequest):
     """
     Search Indian Kanoon database for case laws
-    Supports filters: court type, date range, sorting
+    Supports filters: court type, date range (applied by Kanoon), sorting.
+    Fetches as many result pages as needed to fill max_results.
+    With "stream": true, returns NDJSON: one {"case": ...} line per case as
+    pages arrive (relevance order, sort_by ignored), then {"status", "total"}.
     """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    if request.stream:
+        # Reject up front while a clean 503 is still possible
+        kanoon_pool.check()
+
+        async def ndjson():
+            total = 0
+            try:
+                async with kanoon_pool.slot():
+                    async for case in _iter_cases(request):
+                        total += 1
+                        yield json.dumps({"case": case}) + "\n"
+                yield json.dumps({"status": "success", "total": total}) + "\n"
+            except Exception as e:
+                yield json.dumps({"status": "error", "detail": f"Case law search failed: {str(e)}"}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
     try:
-        if not request.query.strip():
-            raise HTTPException(status_code=400, detail="Query cannot be empty")
-        
-        results = ik_api.search_legal_cases(
-            query=request.query,
-            court=request.court,
-            max_cites=request.max_results or 10
-        )
-        
-        if not results or 'docs' not in results:
-            return CaseLawResponse(
-                status="success",
-                cases=[],
-                total=0
-            )
-        
-        cases = []
-        for doc in results['docs']:
-            # Parse date for filtering
-            doc_date = doc.get('publishdate', '')
-            
-            # Apply date filters if provided
-            if request.from_date and doc_date < request.from_date:
-                continue
-            if request.to_date and doc_date > request.to_date:
-                continue
-            
-            cases.append({
-                "id": doc.get('tid'),
-                "title": doc.get('title', 'Untitled'),
-                "court": doc.get('doctype', 'Unknown Court'),
-                "date": doc_date or 'N/A',
-                "cite_count": doc.get('numcites', 0),
-                "link": f"https://indiankanoon.org/doc/{doc.get('tid')}/"
-            })
-        
+        async with kanoon_pool.slot():
+            cases = [case async for case in _iter_cases(request)]
+
         # Apply sorting
         if request.sort_by == "date":
             cases.sort(key=lambda x: x['date'], reverse=True)
         elif request.sort_by == "citations":
             cases.sort(key=lambda x: x['cite_count'], reverse=True)
         # 'relevance' is default order from API
-        
+
         return CaseLawResponse(
             status="success",
             cases=cases,
             total=len(cases)
         )
-        
+
+    except Saturated:
+        raise
+    except ik_api.SearchFailed as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Case law search failed: {str(e)}")
 
@@ -198,7 +390,8 @@ async def get_case_document(doc_id: int):
     Get the full text of a specific case judgment
     """
     try:
-        text = ik_api.get_clean_verdict_text(doc_id)
+        async with kanoon_pool.slot():
+            text = await ik_api.aget_clean_verdict_text(doc_id)
         
         if "Error:" in text:
             raise HTTPException(status_code=404, detail="Document not found")
@@ -210,10 +403,32 @@ async def get_case_document(doc_id: int):
             "link": f"https://indiankanoon.org/doc/{doc_id}/"
         }
         
-    except HTTPException:
+    except (Saturated, HTTPException):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve document: {str(e)}")
 
+@app.get("/rate-limits")
+async def get_rate_limits():
+    """
+    Current LLM quota headroom per provider and model, shared by all workers
+    """
+    return await asyncio.to_thread(rate_limiter.headroom)
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Cache counters and worker pool queue depths for this worker
+    """
+    return {
+        "pools": {name: pool.stats() for name, pool in POOLS.items()},
+        "rate_limits": await asyncio.to_thread(rate_limiter.headroom),
+        "judgment_cache": await asyncio.to_thread(ik_api.judgment_cache.stats),
+        "search_cache": search_cache.stats(),
+        "compare_cache": await asyncio.to_thread(compare_cache.stats),
+        "sessions": await asyncio.to_thread(agent.sessions.stats) if agent else None,
+        "prompt_history": agent.history.stats() if agent else None,
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="localhost", port=8000)
\ No newline at end of file
@@ -0,0 +1,204 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+# --- CONFIGURATION ---
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")   # "memory" or "sqlite" (shared by workers)
+SESSION_DB_PATH = os.getenv(
+    "SESSION_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.sqlite3"))
+MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))           # turns kept per session
+MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024)))  # text kept per session
+MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))  # idle sessions beyond this are evicted (LRU)
+TTL = float(os.getenv("SESSION_TTL", str(2 * 60 * 60)))         # seconds of inactivity before a session expires
+
+
+def _turn_bytes(user: str, assistant: str) -> int:
+    return len(user.encode("utf-8")) + len(assistant.encode("utf-8"))
+
+
+class MemorySessionStore:
+    """
+    Conversation turns per session id, for one worker process.
+
+    Each session keeps at most max_turns turns and max_bytes of text; older
+    turns are dropped first. Sessions idle for longer than ttl expire, and
+    the least recently used ones are evicted beyond max_sessions, so memory
+    stays bounded however many users come and go.
+    """
+
+    def __init__(self, max_turns: int = MAX_TURNS, max_bytes: int = MAX_BYTES,
+                 max_sessions: int = MAX_SESSIONS, ttl: float = TTL):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _expire(self, now: float) -> None:
+        # Oldest first, so stop at the first live session
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["last_used"] <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id: str) -> List[Dict]:
+        """Turns of a session, oldest first: [{"user": ..., "assistant": ...}]."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            session["last_used"] = now
+            self._sessions.move_to_end(session_id)
+            return [dict(turn) for turn in session["turns"]]
+
+    def append(self, session_id: str, user: str, assistant: str) -> None:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = {"turns": deque(), "bytes": 0, "last_used": now}
+            session["turns"].append({"user": user, "assistant": assistant})
+            session["bytes"] += _turn_bytes(user, assistant)
+            session["last_used"] = now
+            self._sessions.move_to_end(session_id)
+
+            # Keep the newest turn even if it alone exceeds max_bytes
+            while len(session["turns"]) > 1 and (
+                    len(session["turns"]) > self.max_turns or session["bytes"] > self.max_bytes):
+                old = session["turns"].popleft()
+                session["bytes"] -= _turn_bytes(old["user"], old["assistant"])
+            self._expire(now)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire(time.time())
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": sum(s["bytes"] for s in self._sessions.values()),
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Same interface and limits as MemorySessionStore, kept in a SQLite file
+    (WAL mode) so every uvicorn worker on the host sees the same sessions.
+    One connection per thread.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, max_turns: int = MAX_TURNS, max_bytes: int = MAX_BYTES,
+                 max_sessions: int = MAX_SESSIONS, ttl: float = TTL):
+        self.path = path
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_turns (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    turn TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> None:
+        stale = conn.execute(
+            "SELECT session_id FROM sessions WHERE last_used < ?", (now - self.ttl,)).fetchall()
+        overflow = conn.execute(
+            "SELECT session_id FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+            (self.max_sessions,)).fetchall()
+        for (session_id,) in set(stale) | set(overflow):
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def get(self, session_id: str) -> List[Dict]:
+        now = time.time()
+        with self._connect() as conn:
+            touched = conn.execute(
+                "UPDATE sessions SET last_used = ? WHERE session_id = ? AND last_used >= ?",
+                (now, session_id, now - self.ttl)).rowcount
+            if not touched:
+                return []
+            rows = conn.execute(
+                "SELECT turn FROM session_turns WHERE session_id = ? ORDER BY seq", (session_id,)).fetchall()
+        return [json.loads(turn) for (turn,) in rows]
+
+    def append(self, session_id: str, user: str, assistant: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            # Expire first, so a returning session never revives turns past their TTL
+            self._expire(conn, now)
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?)", (session_id, now))
+            conn.execute(
+                "INSERT INTO session_turns "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM session_turns WHERE session_id = ?",
+                (session_id, json.dumps({"user": user, "assistant": assistant}, ensure_ascii=False),
+                 _turn_bytes(user, assistant), session_id))
+
+            # Drop the oldest turns beyond the caps, always keeping the newest
+            rows = conn.execute(
+                "SELECT seq, bytes FROM session_turns WHERE session_id = ? ORDER BY seq DESC",
+                (session_id,)).fetchall()
+            total = 0
+            for kept, (seq, size) in enumerate(rows):
+                total += size
+                if kept and (kept >= self.max_turns or total > self.max_bytes):
+                    conn.execute("DELETE FROM session_turns WHERE session_id = ? AND seq <= ?", (session_id, seq))
+                    break
+
+    def clear(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict:
+        with self._connect() as conn:
+            self._expire(conn, time.time())
+        sessions, = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        size, = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM session_turns").fetchone()
+        return {"backend": "sqlite", "sessions": sessions, "bytes": size}
+
+
+def make_session_store(backend: Optional[str] = None):
+    """The store selected by SESSION_BACKEND."""
+    backend = backend or SESSION_BACKEND
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"❌ Unknown SESSION_BACKEND '{backend}' (use 'memory' or 'sqlite')")
@@ -1,24 +1,14 @@
 import sys
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from deep_translator import GoogleTranslator
 import json
+from RAG_Builder.translation import translate_query
+
 # --- CONFIGURATION ---
 DB_DIRECTORY = "./legal_db"
 MODEL_NAME = "BAAI/bge-small-en-v1.5"
 CONFIDENCE_THRESHOLD = 0.35  # Tune this (0.0 to 1.0). 
 
-def translate_query(text):
-    try:
-        # Only translate if characters are non-ASCII (likely Hindi/Indic)
-        if not text.isascii():
-            translated = GoogleTranslator(source='auto', target='en').translate(text)
-            return translated
-        return text
-    except Exception as e:
-        print(f"⚠️ Translation Error: {e}")
-        return text
-
 def main():
     print("⏳ Loading Legal Brain...")
     embedding_function = HuggingFaceEmbeddings(
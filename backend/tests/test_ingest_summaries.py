@@ -0,0 +1,46 @@
+import csv
+import json
+
+from RAG_Builder.ingest_summaries import main, parse_mappings_csv, split_sections
+
+
+def _write_table(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["CORRESPONDENCE TABLE and COMPARISON SUMMARY", "", "", ""])
+        writer.writerow(["BNS\nSections", "Subject", "IPC\nSections", "Summary of comparison"])
+        writer.writerows(rows)
+
+
+def test_split_sections():
+    assert split_sections("54 & 55") == ["54", "55"]
+    assert split_sections("68, 69") == ["68", "69"]
+    assert split_sections("376(1)/376(2)") == ["376(1)", "376(2)"]
+    assert split_sections("228A(1)/(2)") == ["228A(1)", "228A(2)"]
+    assert split_sections("29 and 29A") == ["29", "29A"]
+    assert split_sections("363A,") == ["363A"]
+    assert split_sections("137 (1)\n(b)") == ["137(1)(b)"]
+    assert split_sections("New") == ["New"]
+    assert split_sections("") == [""]
+
+
+def test_composite_ipc_cell_becomes_one_row_per_section(tmp_path):
+    table = tmp_path / "mappings.csv"
+    _write_table(table, [
+        ["8", "Definitions", "54 & 55", "Commutation of sentence merged."],
+        ["9", "Limit of punishment", "71", "Ditto."],
+    ])
+
+    rows = parse_mappings_csv(str(table))
+
+    assert [(r["BNS_Section"], r["IPC_Section"]) for r in rows] == [("8", "54"), ("8", "55"), ("9", "71")]
+    assert {r["Summary"] for r in rows} == {"Commutation of sentence merged."}
+
+
+def test_main_writes_only_the_given_output(tmp_path):
+    table = tmp_path / "mappings.csv"
+    _write_table(table, [["4", "Punishments", "53", "Community service added."]])
+    output = tmp_path / "summaries.json"
+
+    assert main(["--csv", str(table), "--output", str(output)]) == 0
+    assert json.loads(output.read_text(encoding="utf-8"))[0]["IPC_Section"] == "53"
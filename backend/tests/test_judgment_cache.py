@@ -0,0 +1,25 @@
+import os
+
+import judgment_cache
+from judgment_cache import JudgmentCache
+
+
+def test_put_round_trips(tmp_path):
+    cache = JudgmentCache(str(tmp_path))
+
+    cache.put(42, "Held: appeal dismissed.")
+
+    assert cache.get(42) == "Held: appeal dismissed."
+
+
+def test_failed_put_leaves_no_temp_file(tmp_path, monkeypatch):
+    cache = JudgmentCache(str(tmp_path))
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(judgment_cache.os, "replace", fail)
+    cache.put(42, "Held: appeal dismissed.")
+
+    assert os.listdir(tmp_path) == []
+    assert cache.writes == 0
@@ -0,0 +1,52 @@
+import os
+
+from judgment_text import extract_text, iter_paragraphs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_modern_judgment_paragraphs():
+    paragraphs = list(iter_paragraphs(_load("kanoon_modern.html")))
+
+    assert paragraphs[:5] == [
+        "Supreme Court of India",
+        "Rajesh Kumar vs State Of Haryana on 12 March, 2019",
+        "Equivalent citations: AIR 2019 SC 1423, (2019) 4 SCC 210",
+        "Author: Ashok Bhushan",
+        "Bench: Ashok Bhushan, K.M. Joseph",
+    ]
+    assert paragraphs[8:] == [
+        "1. This appeal has been filed against the judgment of the High Court of Punjab & Haryana "
+        "confirming the conviction of the appellant under Section 302 of the Indian Penal Code.",
+        "2. The only question which arises for consideration is whether the offence falls under "
+        "Exception 4 to Section 300 IPC.",
+        '"Exception 4.—Culpable homicide is not murder if it is committed without '
+        'premeditation in a sudden fight."',
+        "3. In the result, the appeal is partly allowed and the conviction is altered to one "
+        "under Section 304 Part I IPC.",
+    ]
+    assert not any("docid" in p for p in paragraphs)
+
+
+def test_headnote_in_pre_keeps_its_lines():
+    paragraphs = list(iter_paragraphs(_load("kanoon_headnote.html")))
+
+    start = paragraphs.index("HEADNOTE:")
+    assert paragraphs[start + 1:paragraphs.index("JUDGMENT:")] == [
+        "Grave and sudden provocation-Test-Accused not deprived of",
+        "self-control-Indian Penal Code, 1860 (45 of 1860), s. 300,",
+        "Exception 1.",
+    ]
+    assert paragraphs[-1] == "The appeal is dismissed."
+
+
+def test_extract_text_separates_paragraphs_with_blank_lines():
+    html = _load("kanoon_headnote.html")
+
+    assert extract_text(html) == "\n\n".join(iter_paragraphs(html))
+    assert "\n\nRAMESH CHAND\n\nVs.\n\n" in extract_text(html)
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from onnx_embeddings import _write_atomic
+
+
+def test_write_atomic_publishes_the_file(tmp_path):
+    path = tmp_path / "model.onnx"
+
+    _write_atomic(str(path), lambda tmp: open(tmp, "wb").write(b"graph"))
+
+    assert path.read_bytes() == b"graph"
+    assert os.listdir(tmp_path) == ["model.onnx"]
+
+
+def test_failed_write_leaves_nothing_behind(tmp_path):
+    path = tmp_path / "model.onnx"
+
+    def fail(tmp):
+        with open(tmp, "wb") as f:
+            f.write(b"half a gra")
+        raise RuntimeError("export crashed")
+
+    with pytest.raises(RuntimeError):
+        _write_atomic(str(path), fail)
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+import indian_kanoon_lib as ik_api
+
+
+def _collect(max_results, monkeypatch, duplicates=0):
+    requested = []
+
+    async def fake_search(query, court=None, from_date=None, to_date=None, pagenum=0):
+        requested.append(pagenum)
+        start = pagenum * ik_api.PAGE_SIZE - duplicates * min(pagenum, 1)
+        return {"docs": [{"tid": start + i} for i in range(ik_api.PAGE_SIZE)]}
+
+    monkeypatch.setattr(ik_api, "asearch_legal_cases", fake_search)
+
+    async def run():
+        return [doc async for doc in ik_api.aiter_search_results("theft", max_results)]
+
+    return asyncio.run(run()), sorted(requested)
+
+
+@pytest.mark.parametrize("max_results", [1, 3, ik_api.PAGE_SIZE])
+def test_one_page_is_enough_for_a_page_or_less(max_results, monkeypatch):
+    docs, requested = _collect(max_results, monkeypatch)
+
+    assert len(docs) == max_results
+    assert requested == [0]
+
+
+def test_zero_results_fetches_nothing(monkeypatch):
+    docs, requested = _collect(0, monkeypatch)
+
+    assert docs == [] and requested == []
+
+
+def test_pages_match_max_results(monkeypatch):
+    docs, requested = _collect(2 * ik_api.PAGE_SIZE + 1, monkeypatch)
+
+    assert len(docs) == 2 * ik_api.PAGE_SIZE + 1
+    assert requested == [0, 1, 2]
+
+
+def test_duplicates_are_topped_up_with_another_page(monkeypatch):
+    docs, requested = _collect(2 * ik_api.PAGE_SIZE, monkeypatch, duplicates=5)
+
+    assert len({doc["tid"] for doc in docs}) == 2 * ik_api.PAGE_SIZE
+    assert requested == [0, 1, 2]
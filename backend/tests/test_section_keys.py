@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from compare_cache import CompareKey, normalize_section
+
+
+@pytest.mark.parametrize("section, expected", [
+    ("498A", "498A"),
+    ("304 b", "304B"),
+    ("376AB(2)", "376AB(2)"),
+    ("498", "498"),
+    ("420 of IPC", "420"),
+])
+def test_normalize_section_keeps_letter_suffix(section, expected):
+    assert normalize_section("IPC", section) == ("IPC", expected)
+
+
+def test_lettered_sections_get_their_own_precompute_and_cache_keys():
+    pytest.importorskip("groq")
+    from precompute_comparisons import comparison_keys
+
+    backend = SimpleNamespace(
+        ipc_to_bns={"498": [], "498A": [], "304": [], "304B": []},
+        bns_to_ipc={"85": [{"specific_clause": "85"}], "86": [{"specific_clause": "86"}]},
+    )
+
+    keys = comparison_keys(backend)
+
+    assert ("IPC", "498A") in keys and ("IPC", "498") in keys
+    assert ("IPC", "304B") in keys and ("IPC", "304") in keys
+    cache_keys = {CompareKey(law, section, "corpus", "model", "1") for law, section in keys}
+    assert len(cache_keys) == len(keys)
+
+
+def test_process_query_resolves_lettered_section(monkeypatch):
+    pytest.importorskip("groq")
+    import mapper
+
+    monkeypatch.setattr(mapper, "GROQ_API_KEY", "test")
+    monkeypatch.setattr(mapper, "Groq", lambda **kwargs: None)
+    monkeypatch.setattr(mapper, "get_bucket", lambda *args: None)
+    backend = mapper.LegalBackend(snapshot_mode="off")
+
+    result = backend.process_query("IPC 498A", mode="local")
+
+    assert result["primary"]["id"] == "IPC 498A"
@@ -0,0 +1,115 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class Saturated(Exception):
+    """A pool's workers and queue are all taken; the caller should retry later."""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"{pool} pool is saturated")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    A thread pool for one class of blocking work with a bounded queue.
+
+    At most max_workers calls run at once and at most max_queue more wait for
+    a thread; anything beyond that is rejected immediately with Saturated
+    instead of piling up, so the caller can shed load with a 503. Each pool
+    has its own threads, so slow agent runs never hold up /compare.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 5):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self.in_flight = 0      # running + queued
+        self.completed = 0
+        self.rejected = 0
+
+    def check(self):
+        """Raises Saturated if a new call would be rejected right now."""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Saturated(self.name, self.retry_after)
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Saturated(self.name, self.retry_after)
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs a blocking call on this pool without blocking the event loop."""
+        self._admit()
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Released when the thread finishes, not when the awaiter gives up:
+        # a cancelled request must not free a slot whose thread is still busy
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Admission control for async work that needs no thread (e.g. pooled
+        HTTP calls): counts against the same limit and raises Saturated when
+        the pool is full.
+        """
+        self._admit()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.max_workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool_from_env(name: str, workers: int, queue: int, retry_after: int) -> BoundedExecutor:
+    prefix = name.upper()
+    return BoundedExecutor(
+        name,
+        max_workers=int(os.getenv(f"{prefix}_POOL_WORKERS", workers)),
+        max_queue=int(os.getenv(f"{prefix}_POOL_QUEUE", queue)),
+        retry_after=int(os.getenv(f"{prefix}_POOL_RETRY_AFTER", retry_after)),
+    )
+
+
+# --- POOLS (sizes per uvicorn worker, overridable e.g. AGENT_POOL_WORKERS=4) ---
+compare_pool = _pool_from_env("compare", workers=4, queue=16, retry_after=5)
+agent_pool = _pool_from_env("agent", workers=2, queue=4, retry_after=30)
+kanoon_pool = _pool_from_env("kanoon", workers=16, queue=48, retry_after=5)
+
+POOLS = {pool.name: pool for pool in (compare_pool, agent_pool, kanoon_pool)}
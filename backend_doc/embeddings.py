@@ -1,11 +1,12 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+from onnx_embeddings import make_embeddings
 from numpy import dot
 from numpy.linalg import norm
 import time
 
 def get_embedding_function():
     # start = time.time()
-    embedding_fucntion = HuggingFaceEmbeddings(model_name="./embedding_model")
+    # EMBEDDING_BACKEND=onnx uses the quantized ONNX Runtime export of the same model
+    embedding_fucntion = make_embeddings("./embedding_model")
     # end = time.time()
     # vector1 = embedding_fucntion.embed_query("I love machine learning")
     # vector2 = embedding_fucntion.embed_query("I love machine learning")
@@ -0,0 +1,123 @@
+# The registry from backend/resources.py; this server has no warm-ups to run.
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# --- CONFIGURATION ---
+# "1": load every registered resource in a background thread at startup
+# "0": load each one on first use
+PRELOAD = os.getenv("PRELOAD_RESOURCES", "1") == "1"
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class ResourceUnavailable(RuntimeError):
+    """A resource failed to load (or did not finish loading in time)."""
+
+
+class _Resource:
+    def __init__(self, name: str, loader: Callable[[], Any], critical: bool):
+        self.name = name
+        self.loader = loader
+        self.critical = critical
+        self.state = PENDING
+        self.value = None
+        self.error: Optional[str] = None
+        self.exception: Optional[BaseException] = None
+        self.seconds: Optional[float] = None
+        self.done = threading.Event()
+
+
+class ResourceRegistry:
+    """
+    Heavy, process-wide resources (embedding models, vector stores, indexes)
+    by name, each loaded exactly once: on first get(), or earlier by
+    preload() in a background thread, so the server accepts connections
+    before they are ready.
+
+    Loaders may get() other resources, which loads them first. A failed load
+    is reported by status() and retried on the next get(). Only "critical"
+    resources decide readiness; the rest report their state for /readyz.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, _Resource] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], critical: bool = False):
+        with self._lock:
+            self._resources[name] = _Resource(name, loader, critical)
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """The loaded resource; loads it in this thread, or waits for the thread already loading it."""
+        resource = self._resources[name]
+        with self._lock:
+            load_here = resource.state in (PENDING, FAILED)
+            if load_here:
+                resource.state = LOADING
+                resource.done.clear()
+
+        if load_here:
+            self._load(resource)
+        elif not resource.done.wait(timeout):
+            raise ResourceUnavailable(f"{name} is still loading")
+
+        if resource.state != READY:
+            raise ResourceUnavailable(f"{name} failed to load: {resource.error}") from resource.exception
+        return resource.value
+
+    def peek(self, name: str) -> Any:
+        """The resource if it is already loaded, else None (never blocks or loads)."""
+        resource = self._resources[name]
+        return resource.value if resource.state == READY else None
+
+    def _load(self, resource: _Resource):
+        print(f"⏳ Loading {resource.name}...")
+        started = time.perf_counter()
+        try:
+            resource.value = resource.loader()
+            resource.error = resource.exception = None
+            resource.state = READY
+            print(f"✅ {resource.name} ready ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            resource.error = f"{type(e).__name__}: {e}"
+            resource.exception = e
+            resource.state = FAILED
+            print(f"❌ {resource.name} failed to load: {resource.error}")
+        finally:
+            resource.seconds = round(time.perf_counter() - started, 3)
+            resource.done.set()
+
+    def preload(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Loads resources (all by default, in registration order) in the background."""
+        names = list(names) if names is not None else list(self._resources)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except ResourceUnavailable:
+                    pass  # Reported by status(); the next get() retries
+
+        thread = threading.Thread(target=run, name="resource-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """One resource's readiness, or, without a name, whether every critical resource is loaded."""
+        if name is not None:
+            return self._resources[name].state == READY
+        return all(r.state == READY for r in self._resources.values() if r.critical)
+
+    def status(self) -> Dict[str, Any]:
+        resources = {
+            name: {"state": r.state, "critical": r.critical, "seconds": r.seconds,
+                   **({"error": r.error} if r.error else {})}
+            for name, r in list(self._resources.items())
+        }
+        return {"ready": self.is_ready(), "resources": resources}
+
+
+# Shared by the server and the modules that register resources at import time
+registry = ResourceRegistry()
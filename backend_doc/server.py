@@ -1,9 +1,10 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from langchain_chroma import Chroma
 from embeddings import get_embedding_function
-import time
 from langchain_google_genai import ChatGoogleGenerativeAI
 # from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
@@ -11,6 +12,7 @@ import os
 from query import main as run
 from ingest import main
 from fastapi.responses import JSONResponse
+from resources import PRELOAD, registry
 
 
 load_dotenv()
@@ -20,21 +22,24 @@ api_key = os.environ.get("GOOGLE_API_KEY")
 if not api_key:
     raise ValueError("GOOGLE_API_KEY not set in .env file")
 
-# llm = ChatGoogleGenerativeAI(model="models/gemini-2.0-flash", temperature=0.2, google_api_key=api_key)
-
-llm = ChatGoogleGenerativeAI(model="models/gemini-2.0-flash", temperature=0.2, google_api_key=api_key)
-
-print("Loading Model")
-start_model = time.time()
-embedding_fn = get_embedding_function()
-end_model = time.time()
-print(f"Model loaded, time {end_model-start_model}")
+# The embedding model and the Gemini client load in the background (or on
+# first use), so the server answers /healthz while they are loading.
+registry.register("llm", lambda: ChatGoogleGenerativeAI(
+    model="models/gemini-2.0-flash", temperature=0.2, google_api_key=api_key), critical=True)
+registry.register("embeddings", get_embedding_function, critical=True)
 
 CHROMA_PATH = "chroma"
 DATA_PATH = "data"
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD:
+        registry.preload()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow requests from frontend
 app.add_middleware(
@@ -56,12 +61,24 @@ class QueryRequest(BaseModel):
     query: str
 
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # 200 once the embedding model and the Gemini client are loaded
+    status = registry.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
 @app.post("/docquery")
 async def query(request:QueryRequest):
     try:
         id = request.id
         query = request.query
         # request_dic = {"id":}
+        llm = await asyncio.to_thread(registry.get, "llm")
+        embedding_fn = await asyncio.to_thread(registry.get, "embeddings")
         response = run(id,query,llm,embedding_fn)
         if response["error"] == "":
             return JSONResponse(content=response,status_code=200)
@@ -86,6 +103,7 @@ async def ingest_api(id: str = Form(),file: UploadFile = File(...), filename: st
         with open(file_path, "wb") as f:
             content = await file.read()
             f.write(content)
+        embedding_fn = await asyncio.to_thread(registry.get, "embeddings")
         response = main(id,embedding_fn,reset_db)
         if response["error"] == "":
             return JSONResponse(content=response,status_code=200)
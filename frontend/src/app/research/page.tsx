@@ -37,6 +37,7 @@ export default function ResearchPage() {
   const [response, setResponse] = useState<ParsedResponse | null>(null);
   const [conversationHistory, setConversationHistory] = useState<ConversationEntry[]>([]);
   const [selectedMessageIndex, setSelectedMessageIndex] = useState<number | null>(null);
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   // Parse the structured response
   const parseResponse = (rawResponse: string): ParsedResponse => {
@@ -90,7 +91,7 @@ export default function ResearchPage() {
       const res = await fetch("http://localhost:8000/agent", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ query: searchQuery }),
+        body: JSON.stringify({ query: searchQuery, session_id: sessionId }),
       });
 
       if (!res.ok) {
@@ -99,6 +100,7 @@ export default function ResearchPage() {
       }
 
       const data = await res.json();
+      setSessionId(data.session_id);
       const parsed = parseResponse(data.response);
       setResponse(parsed);
       